@@ -13,79 +13,58 @@ bl_info = {
     "tracker_url": "https://gitlab.com/Worldblender/io_scene_numdlb/issues",
     "category": "Import-Export"}
 
-import bmesh, bpy, math, mathutils, os, struct, sys, time
+import bpy, collections, math, mathutils, os, queue, sys, threading, time
+import numpy as np
 from bpy_extras import image_utils, node_shader_utils
-
-def decompressHalfFloat(bytes):
-    return struct.unpack("<e", bytes)[0]
-
-class MaterialData:
-    def __init__(self):
-        self.materialName = ""
-        self.color1Name = ""
-        self.color2Name = ""
-        self.bakeName = ""
-        self.normalName = ""
-        self.emissive1Name = ""
-        self.emissive2Name = ""
-        self.prmName = ""
-        self.envName = ""
-
-    def __repr__(self):
-        return "Material name: " + str(self.materialName) + "\t| Color 1 name: " + str(self.color1Name) + "\t| Color 2 name: " + str(self.color2Name) + "\t| Bake name: " + str(self.bakeName) + "\t| Normal name: " + str(self.normalName) + "\t| Emissive 1 name: " + str(self.emissive1Name) + "\t| Emissive 2 name: " + str(self.emissive2Name) + "\t| PRM name: " + str(self.prmName) + "\t| Env name: " + str(self.envName) + "\n"
-
-class WeightData:
-    def __init__(self):
-        self.boneIDs = []
-        self.weights = []
-
-    def __init__(self, boneIDs, weights):
-        self.boneIDs = boneIDs
-        self.weights = weights
-
-    def __repr__(self):
-        return "Bone IDs: " + str(self.boneIDs) + "\t| Weights: " + str(self.weights) + "\n"
-
-class PolygonGroupData:
-    def __init__(self):
-        self.visGroupName = ""
-        self.singleBindName = ""
-        self.facepointCount = 0
-        self.facepointStart = 0
-        self.faceLongBit = 0
-        self.verticeCount = 0
-        self.verticeStart = 0
-        self.verticeStride = 0
-        self.UVStart = 0
-        self.UVStride = 0
-        self.bufferParamStart = 0
-        self.bufferParamCount = 0
-
-    def __repr__(self):
-        return "Vis group name: " + str(self.visGroupName) + "\t| Single bind name: " + str(self.singleBindName) + "\t| Facepoint count: " + str(self.facepointCount) + "\t| Facepoint start: " + str(self.facepointStart) + "\t| Face long bit: " + str(self.faceLongBit) + "\t| Vertice count: " + str(self.verticeCount) + "\t| Vertice start " + str(self.verticeStart) + "\t| Vertice stride: " + str(self.verticeStride) + "\t| UV start: " + str(self.UVStart) + "\t| UV stride: " + str(self.UVStride) + "\t| Buffer parameter start: " + str(self.bufferParamStart) + "\t| Buffer parameter count: " + str(self.bufferParamCount) + "\n"
-
-class WeightGroupData:
-    def __init__(self):
-        self.groupName = ""
-        self.subGroupNum = 0
-        self.weightInfMax = 0
-        self.weightFlag2 = 0
-        self.weightFlag3 = 0
-        self.weightFlag4 = 0
-        self.rigInfOffset = 0
-        self.rigInfCount =  0
-
-    def __repr__(self):
-        return str(self.groupName) + "\t| Subgroup #: " + str(self.subGroupNum) + "\t| Weight info max: " + str(self.weightInfMax) + "\t| Weight flags: " + str(self.weightFlag2) + ", " + str(self.weightFlag3) + ", " + str(self.weightFlag4) + "\t| Rig info offset: " + str(self.rigInfOffset) + "\t| Rig info count: " + str(self.rigInfCount) + "\n"
-
-def readVarLenString(file):
-    nameBuffer = []
-    while('\x00' not in nameBuffer):
-        nameBuffer.append(str(file.read(1).decode("utf-8", "ignore")))
-    del nameBuffer[-1]
-    return ''.join(nameBuffer)
-
-def getModelInfo(context, filepath, texture_ext, use_vertex_colors, use_uv_maps, allow_black, use_emissive_maps, use_prm_maps, use_normal_maps, create_rest_action, auto_rotate):
+from concurrent.futures import ThreadPoolExecutor
+# Pillow isn't bundled with Blender; textures can only be decoded in the background once it has been installed
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+from SSBUlt_SSBH import SSBHReader, ParsedFiles, DecodedFiles, readModel, readMaterials, readSkeleton, readMeshInfo, decodeMeshes, loadValue, LOAD_ERRORS
+
+# Number of decoded items (polygon groups, materials or the skeleton) that may wait to be built at once
+DECODE_QUEUE_DEPTH = 8
+
+# Image file extensions that textures are looked for with, after the one chosen in the import options
+TEXTURE_EXTENSIONS = (".png", ".dds", ".tga", ".bmp", ".jpg", ".jpeg", ".tif", ".tiff", ".exr", ".hdr", ".jp2", ".dpx", ".cin", ".rgb", ".sgi")
+
+# Textures already loaded, so that every file is only loaded once however many materials use it
+# Structure of this dict is: {resolved path: image}; cleared on every import, unless loaded textures are reused for the whole session
+TextureImages = {}
+
+# How the alpha channel of every texture analyzed this session is used, so that each file is only analyzed again once it changes
+# Structure of this dict is: {resolved path: (file size, modification time, alpha usage)}
+TextureAlpha = {}
+
+# Share of the pixels of a texture that may be partly transparent for its alpha to still be clipped instead of hashed
+ALPHA_CLIP_TOLERANCE = 0.01
+
+# Assigns the weights of a polygon group with one call per bone and distinct weight
+# Vertex groups are only created for the bones that the polygon group uses; the armature modifier matches them to bones by name
+def assignWeights(vertexGroups, boneNames, weightArray, verticeCount):
+    bones = {}
+    for boneID, vertIndices, weights in weightArray:
+        bones.setdefault(boneID, []).append((vertIndices, weights))
+    for boneID, influences in bones.items():
+        vertIndices = np.concatenate([influence[0] for influence in influences])
+        weights = np.concatenate([influence[1] for influence in influences])
+        # When a vertex is listed more than once for the same bone, the last weight is kept
+        unused, last = np.unique(vertIndices[::-1], return_index=True)
+        keep = len(vertIndices) - 1 - last
+        keep = keep[vertIndices[keep] < verticeCount]
+        vertIndices = vertIndices[keep]
+        weights = weights[keep]
+        if (len(vertIndices) == 0 or boneID >= len(boneNames)):
+            continue
+        group = vertexGroups.new(name=boneNames[boneID])
+        order = np.argsort(weights, kind='stable')
+        values, starts = np.unique(weights[order], return_index=True)
+        for value, groupIndices in zip(values, np.split(vertIndices[order], starts[1:])):
+            group.add(groupIndices.tolist(), float(value), 'REPLACE')
+
+def getModelInfo(context, filepath, texture_ext, use_vertex_colors, use_uv_maps, use_custom_normals, allow_black, use_emissive_maps, use_prm_maps, use_normal_maps, create_rest_action, auto_rotate, decode_threads, cache_size, cache_meshes, cache_dir, cache_dir_size, reuse_textures, decode_textures, texture_dirs):
     # Semi-global variables used by this function's hierarchy; cleared every time this function runs
     global dirPath; dirPath = ""
     global MODLName; MODLName = ""
@@ -95,60 +74,83 @@ def getModelInfo(context, filepath, texture_ext, use_vertex_colors, use_uv_maps,
     global skelName; skelName = ""
     global MODLGrp_array; MODLGrp_array = {}
     global Materials_array; Materials_array = []
+    global MaterialInfo; MaterialInfo = {}
+    # Structure of this dict is: {material name: MaterialData}
+    global MaterialsBuilt; MaterialsBuilt = {}
+    # Structure of this dict is: {material name: material}; only holds the materials that meshes have used so far
+    global BoneIDArray; BoneIDArray = {}
+    # Structure of this dict is: {bone name: index of the bone in the armature}
+    global TexturesLoaded; TexturesLoaded = 0
+    global TexturesReused; TexturesReused = 0
+    global TexturesDecoded; TexturesDecoded = 0
+    global TextureIndex; TextureIndex = {}
+    # Structure of this dict is: {lowercase texture name: [{lowercase file extension: path} for every directory that has the texture, in search order]}
+    if not reuse_textures:
+        TextureImages.clear()
 
     if os.path.isfile(filepath):
-        with open(filepath, 'rb') as md:
-            dirPath = os.path.dirname(filepath)
-            md.seek(0x10, 0)
-            # Reads the model file to find information about the other files
-            MODLCheck = struct.unpack('<L', md.read(4))[0]
-            if (MODLCheck == 0x4D4F444C):
-                MODLVerA = struct.unpack('<H', md.read(2))[0]
-                MODLVerB = struct.unpack('<H', md.read(2))[0]
-                MODLNameOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                SKTNameOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                MATNameOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                md.seek(0x10, 1)
-                MSHNameOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                MSHDatOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                MSHDatCount = struct.unpack('<L', md.read(4))[0]
-                md.seek(MODLNameOff, 0)
-                MODLName = readVarLenString(md)
-                md.seek(SKTNameOff, 0)
-                SKTName = os.path.join(dirPath, readVarLenString(md))
-                md.seek(MATNameOff, 0)
-                MATNameStrLen = struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                MATName = os.path.join(dirPath, readVarLenString(md))
-                md.seek(MSHNameOff, 0)
-                MSHName = os.path.join(dirPath, readVarLenString(md)); md.seek(0x04, 1)
-                md.seek(MSHDatOff, 0)
-                nameCounter = 0
-                for g in range(MSHDatCount):
-                    MSHGrpNameOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                    MSHUnkNameOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                    MSHMatNameOff = md.tell() + struct.unpack('<L', md.read(4))[0]; md.seek(0x04, 1)
-                    MSHRet = md.tell()
-                    md.seek(MSHGrpNameOff, 0)
-                    meshGroupName = readVarLenString(md)
-                    md.seek(MSHMatNameOff, 0)
-                    meshMaterialName = readVarLenString(md)
-                    if meshGroupName in MODLGrp_array:
-                        nameCounter += 1
-                        MODLGrp_array[meshGroupName + str(nameCounter * .001)[1:]] = meshMaterialName
-                    else:
-                        MODLGrp_array[meshGroupName] = meshMaterialName
-                        nameCounter = 0
-                    md.seek(MSHRet, 0)
-                print(MODLGrp_array)
-            else:
-                raise RuntimeError("%s is not a valid NUMDLB file." % filepath)
-
-        if os.path.isfile(MATName):
-            importMaterials(MATName, use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext)
-        if os.path.isfile(SKTName):
-            importSkeleton(context, SKTName, create_rest_action)
-        if os.path.isfile(MSHName):
-            importMeshes(context, MSHName, texture_ext, use_vertex_colors, use_uv_maps, allow_black)
+        ParsedFiles.setBudget(cache_size * 1048576)
+        DecodedFiles.configure(bpy.path.abspath(cache_dir), cache_dir_size * 1048576)
+        dirPath = os.path.dirname(filepath)
+        TextureIndex = indexTextures([dirPath] + [bpy.path.abspath(d.strip()) for d in texture_dirs.split(";") if d.strip() != ""])
+        # Model files are small, and refer to the other files by where they are, so they're never kept on disk
+        MODLName, SKTName, MATName, MSHName, MODLGrp_array = ParsedFiles.read(readModel, filepath, persist=False)
+
+        # The files are read on a background thread while this thread builds what has been read so far, as Blender data can only be changed from here
+        # The queue holds at most DECODE_QUEUE_DEPTH decoded items, which keeps memory bounded by its depth rather than by the size of the model
+        Decoded = queue.Queue(maxsize=DECODE_QUEUE_DEPTH)
+        stop = threading.Event()
+        decoder = threading.Thread(target=decodeModel, args=(Decoded, stop, MATName, SKTName, MSHName,
+            use_vertex_colors, use_uv_maps, use_custom_normals, allow_black, decode_threads, cache_meshes), daemon=True)
+        decoder.start()
+
+        # Used to find the vertex group name for a bone index
+        BoneNames = []
+        # Stays None unless textures are decoded in the background
+        TextureDecodes = None
+        build_time = 0.0
+        built = 0
+        try:
+            while True:
+                kind, item = Decoded.get()
+                if (kind == "done"):
+                    break
+                elif (kind == "error"):
+                    raise item
+                elif (kind == "materials"):
+                    # Materials are only created once a mesh uses them, so only their textures are started on now
+                    Materials_array.extend(item)
+                    for pe in item:
+                        MaterialInfo[pe.materialName[:63]] = pe
+                    if decode_textures:
+                        if PILImage is not None:
+                            TextureDecodes = decodeTextures(decode_threads, use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext)
+                        else:
+                            print("Pillow is not installed, so textures are loaded by Blender instead of in the background")
+                elif (kind == "skeleton"):
+                    importSkeleton(context, item, create_rest_action)
+                    BoneNames = list(BoneIDArray)
+                elif (kind == "mesh"):
+                    build_start = time.time()
+                    material = getMaterial(MODLGrp_array.get(item[0].visGroupName), use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext, TextureDecodes)
+                    if buildPolygonGroup(context, item[0], item[1], material, BoneNames):
+                        built += 1
+                    build_time += time.time() - build_start
+        finally:
+            # Stop the decoder if building failed, emptying the queue so that it isn't left waiting on it
+            stop.set()
+            while decoder.is_alive():
+                try:
+                    Decoded.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            # Textures of materials that no mesh used are never loaded
+            if TextureDecodes is not None:
+                TextureDecodes.close()
+        print("Built " + str(built) + " meshes in " + str(round(build_time, 4)) + " seconds")
+        print("Created " + str(len(MaterialsBuilt)) + " of " + str(len(MaterialInfo)) + " materials; loaded " + str(TexturesLoaded) + " textures and decoded " + str(TexturesDecoded) + " in the background; " + str(TexturesReused) + " loads avoided by reusing already loaded textures")
+        ParsedFiles.printStats()
+        DecodedFiles.printStats()
 
         # Rotate armature if option is enabled
         if auto_rotate:
@@ -157,762 +159,766 @@ def getModelInfo(context, filepath, texture_ext, use_vertex_colors, use_uv_maps,
             bpy.ops.transform.rotate(value=math.radians(90), orient_axis='X', constraint_axis=(True, False, False), orient_type='GLOBAL', mirror=False, use_proportional_edit=False, proportional_edit_falloff='SMOOTH', proportional_size=1)
             bpy.ops.object.select_all(action='TOGGLE')
 
-# Imports the materials
-def importMaterials(MATName, use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext):
-    with open(MATName, 'rb') as mt:
-        mt.seek(0x10, 0)
-        MATCheck = struct.unpack('<L', mt.read(4))[0]
-        if (MATCheck == 0x4D41544C):
-            MATVerA = struct.unpack('<H', mt.read(2))[0]
-            MATVerB = struct.unpack('<H', mt.read(2))[0]
-            MATHeadOff = mt.tell() + struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-            MATCount = struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-            mt.seek(MATHeadOff, 0)
-            for m in range(MATCount):
-                pe = MaterialData()
-                MATNameOff = mt.tell() + struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-                MATParamGrpOff = mt.tell() + struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-                MATParamGrpCount = struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-                MATShdrNameOff = mt.tell() + struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-                MATRet = mt.tell()
-                mt.seek(MATNameOff, 0)
-                pe.materialName = readVarLenString(mt)
-                print("Textures for " + pe.materialName + ":")
-                mt.seek(MATParamGrpOff, 0)
-                for p in range(MATParamGrpCount):
-                    MatParamID = struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-                    MatParamOff = mt.tell() + struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-                    MatParamType = struct.unpack('<L', mt.read(4))[0]; mt.seek(0x04, 1)
-                    MatParamRet = mt.tell()
-                    if (MatParamType == 0x0B):
-                        mt.seek(MatParamOff + 0x08, 0)
-                        TexName = str.lower(readVarLenString(mt))
-                        print("(" + hex(MatParamID) + ") for " + TexName)
-                        if (MatParamID == 0x5C):
-                            pe.color1Name = TexName
-                        elif (MatParamID == 0x5D):
-                            pe.color2Name = TexName
-                        elif (MatParamID == 0x5F):
-                            pe.bakeName = TexName
-                        elif (MatParamID == 0x60):
-                            pe.normalName = TexName
-                        elif (MatParamID == 0x61):
-                            pe.emissive1Name = TexName
-                            if (pe.color1Name == ""):
-                                pe.color1Name = TexName
-                        elif (MatParamID == 0x62):
-                            pe.prmName = TexName
-                        elif (MatParamID == 0x63):
-                            pe.envName = TexName
-                        elif (MatParamID == 0x65):
-                            pe.bakeName = TexName
-                        elif (MatParamID == 0x66):
-                            pe.color1Name = TexName
-                        elif (MatParamID == 0x67):
-                            pe.color2Name = TexName
-                        elif (MatParamID == 0x6A):
-                            pe.emissive2Name = TexName
-                            if (pe.color2Name == ""):
-                                pe.color2Name = TexName
-                        elif (MatParamID == 0x133):
-                            print("noise_for_warp")
-                        else:
-                            print("Unknown type (" + hex(MatParamID) + ") for " + TexName)
-
-                        mt.seek(MatParamRet, 0)
-
-                print("-----")
-                Materials_array.append(pe)
-                mt.seek(MATRet, 0)
-
-            for m in range(MATCount):
-                # Check and reuse existing same-name material, or create it if it doesn't already exist
-                if (bpy.data.materials.find(Materials_array[m].materialName) > 0):
-                    mat = bpy.data.materials[Materials_array[m].materialName]
-                else:
-                    mat = bpy.data.materials.new(Materials_array[m].materialName)
-                mat.use_fake_user = True
-                mat.use_backface_culling  = True
-                mat.use_nodes = True
-                mat.blend_method = 'OPAQUE'
-                nodes = mat.node_tree.nodes
-                links = mat.node_tree.links
-
-                principled_node = nodes[0]
-                assert principled_node.type == 'BSDF_PRINCIPLED'
-                x, y = principled_node.location
-                # Make it less shiny
-                principled_node.inputs["Specular"].default_value = 0
-                principled_node.inputs["Roughness"].default_value = 1
-
-                if (Materials_array[m].color1Name != ""):
-                    # tex_fname_1 is the diffuse texture.
-                    # May have transparency.
-                    # Check and reuse existing same-name primary texture slot, or create it if it doesn't already exist
-                    tex_fname_1 = image_utils.load_image(Materials_array[m].color1Name + texture_ext, dirPath, place_holder=True, check_existing=True, force_reload=True)
-                    tex_fname_1.alpha_mode = 'NONE'
-
-                    tex1_node = nodes.new(type="ShaderNodeTexImage")
-                    tex1_node.image = tex_fname_1
-
-                    # 'alp_' should be rendered with alpha
-                    # 'def_', 'skin_' should not be rendered with alpha
-                    if ("alp" in Materials_array[m].materialName) or ("head" in Materials_array[m].materialName) or ("mouth" in Materials_array[m].materialName) or ("facial" in Materials_array[m].materialName) or ("AZA" in Materials_array[m].materialName) \
-                    or ("alp" in Materials_array[m].color1Name) or ("head" in Materials_array[m].color1Name) or ("mouth" in Materials_array[m].color1Name) or ("facial" in Materials_array[m].color1Name) or ("AZA" in Materials_array[m].color1Name):
-                        mat.blend_method = 'HASHED'
-                        tex_fname_1.alpha_mode = 'STRAIGHT'
-                        links.new(tex1_node.outputs["Alpha"], principled_node.inputs["Alpha"])
-
-                    uvmap_node = nodes.new(type="ShaderNodeUVMap")
-                    uvmap_node.uv_map = "UVMap" # first UV map for first texture
-                    links.new(uvmap_node.outputs[0], tex1_node.inputs["Vector"])
-
-                    # nor_fname_1 is the normal map.
-                    # R - Normal X+
-                    # G - Normal Y+
-                    # B - Blend Map (unused)
-                    # A - Cavity Map (unused)                 
-                    if (use_normal_maps and Materials_array[m].normalName != ""):
-                        nor_fname_1 = image_utils.load_image(Materials_array[m].normalName + texture_ext, dirPath, place_holder=True, check_existing=True, force_reload=True)
-                        nor_fname_1.colorspace_settings.name = 'Non-Color'
-
-                        nor_tex_node = nodes.new(type="ShaderNodeTexImage")
-                        nor_tex_node.image = nor_fname_1
-                        links.new(uvmap_node.outputs[0], nor_tex_node.inputs["Vector"])
-                        
-                        nor_in_node = nodes.new(type="ShaderNodeSeparateRGB")
-                        links.new(nor_tex_node.outputs["Color"], nor_in_node.inputs["Image"])
-                        
-                        nor_out_node = nodes.new(type="ShaderNodeCombineRGB")
-                        links.new(nor_in_node.outputs["R"], nor_out_node.inputs["R"])
-                        links.new(nor_in_node.outputs["G"], nor_out_node.inputs["G"])
-                        nor_out_node.inputs["B"].default_value = 1.0
-                        
-                        nor_node = nodes.new(type="ShaderNodeNormalMap")
-                        links.new(nor_out_node.outputs["Image"], nor_node.inputs["Color"])
-                        nor_node.uv_map = "UVMap"
-                        
-                        links.new(nor_node.outputs["Normal"], principled_node.inputs["Normal"])
-
-                    # emi_fname_1 is the emissive map.
-                    # Support for one emissive map, not two, is currently implemented.
-                    if (use_emissive_maps and Materials_array[m].emissive1Name != ""):
-                        emi_fname_1 = image_utils.load_image(Materials_array[m].emissive1Name + texture_ext, dirPath, place_holder=True, check_existing=True, force_reload=True)
-
-                        emi_node = nodes.new(type="ShaderNodeTexImage")
-                        emi_node.image = emi_fname_1
-                        links.new(uvmap_node.outputs[0], emi_node.inputs["Vector"])
-                        links.new(emi_node.outputs["Color"], principled_node.inputs["Emission"])
-
-                    # prm_fname_1 is the PRM map, (Physically-based Rendering Map), with these channels:
-                    # Red - mtl (Metallic)
-                    # Green - rgh (Roughness)
-                    # Blue - ao (Ambient Occlusion)
-                    # Alpha - spc (Specular)
-                    if (use_prm_maps and Materials_array[m].prmName != ""):
-                        prm_fname_1 = image_utils.load_image(Materials_array[m].prmName + texture_ext, dirPath, place_holder=True, check_existing=True, force_reload=True)
-
-                        prm_tex_node = nodes.new(type="ShaderNodeTexImage")
-                        prm_tex_node.image = prm_fname_1
-                        links.new(uvmap_node.outputs[0], prm_tex_node.inputs["Vector"])
-
-                        prm_node = nodes.new(type="ShaderNodeSeparateRGB")
-                        links.new(prm_tex_node.outputs["Color"], prm_node.inputs["Image"])
-                        links.new(prm_node.outputs["R"], principled_node.inputs["Metallic"])
-                        links.new(prm_node.outputs["G"], principled_node.inputs["Roughness"])
-                        links.new(prm_tex_node.outputs["Alpha"], principled_node.inputs["Specular"])
-
-                        ao_node = nodes.new(type="ShaderNodeMixRGB")
-                        ao_node.blend_type = 'MULTIPLY'
-                        links.new(tex1_node.outputs["Color"], ao_node.inputs["Color1"])
-                        links.new(prm_node.outputs["B"], ao_node.inputs["Color2"])
-                        ao_node.inputs["Fac"].default_value = 1.0
-
-                    if (Materials_array[m].color2Name != ""):
-                        # tex_fname_2 is overlaid on top of tex_fname_1
-                        # No transparency for tex_fname_1.
-                        # Check and reuse existing same-name secondary texture slot, or create it if it doesn't already exist
-                        tex_fname_2 = image_utils.load_image(Materials_array[m].color2Name + texture_ext, dirPath, place_holder=True, check_existing=True, force_reload=True)
-
-
-                        tex2_node = nodes.new(type="ShaderNodeTexImage")
-                        tex2_node.image = tex_fname_2
-
-                        uvmap_node = nodes.new(type="ShaderNodeUVMap")
-                        uvmap_node.uv_map = "UVMap.001" # second UV map for second texture
-                        links.new(uvmap_node.outputs[0], tex2_node.inputs["Vector"])
-
-                        mix_node = nodes.new(type="ShaderNodeMixRGB")
-
-                        if (use_prm_maps and Materials_array[m].prmName != ""):
-                            links.new(ao_node.outputs["Color"], mix_node.inputs[1])
-                        else:
-                            links.new(tex1_node.outputs["Color"], mix_node.inputs[1])
-
-                        links.new(tex2_node.outputs["Color"], mix_node.inputs[2])
-                        links.new(tex2_node.outputs["Alpha"], mix_node.inputs[0])
+        # Update the view layer once, after every object has been added
+        context.view_layer.update()
 
-                        links.new(mix_node.outputs[0], principled_node.inputs["Base Color"])
-                    else:
-                        if (use_prm_maps and Materials_array[m].prmName != ""):
-                            links.new(ao_node.outputs["Color"], principled_node.inputs["Base Color"])
-                        else:
-                            links.new(tex1_node.outputs["Color"], principled_node.inputs["Base Color"])
+# Loads the textures
+# Lists the image files in each of the directories once, so that textures can be found without checking for every file separately
+# Names are matched regardless of case, and directories listed first are preferred when the same texture is in several of them
+def indexTextures(texDirs):
+    TextureIndex = {}
+    fileCount = 0
+    for texDir in texDirs:
+        try:
+            entries = list(os.scandir(texDir))
+        except OSError:
+            print("Textures can't be searched for in " + texDir)
+            continue
+        DirIndex = {}
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext in TEXTURE_EXTENSIONS and entry.is_file():
+                DirIndex.setdefault(name.lower(), {}).setdefault(ext, entry.path)
+                fileCount += 1
+        for name, exts in DirIndex.items():
+            TextureIndex.setdefault(name, []).append(exts)
+    print("Found " + str(fileCount) + " image files in " + str(len(texDirs)) + " directories")
+    return TextureIndex
+
+# Returns the file of a texture from the first directory that has it, in the chosen file type if it's there, or else in the first other file type found
+# Textures that can't be found get the path that they would have been at, so that a placeholder is made for them
+def findTexture(texName, texture_ext):
+    for exts in TextureIndex.get(texName.lower(), ()):
+        if texture_ext in exts:
+            return exts[texture_ext]
+        for ext in TEXTURE_EXTENSIONS:
+            if ext in exts:
+                return exts[ext]
+    return os.path.join(dirPath, texName + texture_ext)
+
+def getTexturePath(texPath):
+    return os.path.normcase(os.path.abspath(texPath))
+
+# Decodes a texture with Pillow, without touching Blender, so that textures can be decoded on several threads at once
+# Returns the width, height and pixels (as RGBA bytes, bottom row first) of the texture, or None if it can't be decoded
+# The pixels are only turned into floats once they're copied into their image, as that takes four times the memory
+def decodeTexture(path):
+    try:
+        with PILImage.open(path) as texture:
+            pixels = np.asarray(texture.convert("RGBA"), dtype=np.uint8)
+    except (OSError, ValueError):
+        print("Texture " + path + " could not be decoded in the background, loading it with Blender instead")
+        return None
+    height, width = pixels.shape[:2]
+    return width, height, np.flipud(pixels).ravel()
+
+# Decodes textures on a thread pool, in the order that the meshes are expected to need them
+# At most depth textures are decoded ahead of the last one used, so that memory stays bounded however many textures the model has
+class TextureDecoder:
+    def __init__(self, paths, depth):
+        self.executor = ThreadPoolExecutor(max_workers=depth)
+        self.depth = depth
+        self.order = {path: index for index, (path, texPath) in enumerate(paths)} # Structure of this dict is: {resolved path: position in paths}
+        self.pending = collections.deque(paths) # Textures not started yet, as (resolved path, path of the file)
+        self.futures = {} # Structure of this dict is: {resolved path: future of decodeTexture()}
+        self.last = -1 # Position of the last texture used
+        self.fill()
+
+    def fill(self):
+        while (self.pending and self.countAhead() < self.depth):
+            path, texPath = self.pending.popleft()
+            self.futures[path] = self.executor.submit(decodeTexture, texPath)
+
+    # Textures that were skipped over are kept, but don't count towards the ones decoded ahead
+    def countAhead(self):
+        return sum(1 for path in self.futures if self.order[path] > self.last)
+
+    # Returns what decodeTexture() returned for the texture, or None if it isn't decoded in the background
+    # Textures that are needed out of order are still returned once they're asked for, as they're kept until close() is called
+    # Textures that hadn't been started by the time a later one is needed are left to Blender instead, so that they don't hold up the rest
+    def take(self, path):
+        index = self.order.get(path)
+        if index is None:
+            return None
+        self.last = max(self.last, index)
+        while (self.pending and self.order[self.pending[0][0]] <= index):
+            self.pending.popleft()
+        decoded = None
+        future = self.futures.pop(path, None)
+        if future is not None:
+            decoded = future.result()
+        self.fill()
+        return decoded
+
+    # Only the textures that are still waiting to be decoded are cancelled
+    def close(self):
+        for future in self.futures.values():
+            if not future.done():
+                future.cancel()
+        self.futures.clear()
+        self.pending.clear()
+        self.executor.shutdown()
+
+# Starts decoding the textures used by the materials that the model's meshes use in the background, in the order of the model file
+def decodeTextures(decode_threads, use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext):
+    # Structure of this list is: [(resolved path, path of the file)]
+    TexturePaths = []
+    queued = set()
+    for matName in dict.fromkeys(MODLGrp_array.values()):
+        pe = MaterialInfo.get(matName[:63])
+        if (pe is None or pe.color1Name == ""):
+            continue
+        texNames = [pe.color1Name]
+        if use_normal_maps:
+            texNames.append(pe.normalName)
+        if use_emissive_maps:
+            texNames.append(pe.emissive1Name)
+        if use_prm_maps:
+            texNames.append(pe.prmName)
+        texNames.append(pe.color2Name)
+        for texName in texNames:
+            if (texName == ""):
+                continue
+            texPath = findTexture(texName, texture_ext)
+            path = getTexturePath(texPath)
+            if (path not in queued and path not in TextureImages):
+                queued.add(path)
+                TexturePaths.append((path, texPath))
+    return TextureDecoder(TexturePaths, decode_threads)
+
+# Returns the image whose file is at the resolved path, or None if there is none
+def findImage(path):
+    for image in bpy.data.images:
+        if (image.source in {'FILE', 'GENERATED'} and image.filepath_raw != "" and getTexturePath(bpy.path.abspath(image.filepath_raw)) == path):
+            return image
+    return None
+
+def packImage(image):
+    try:
+        # Older versions of Blender have to be told to pack the pixels of the image, instead of its file
+        image.pack(as_png=True)
+    except TypeError:
+        image.pack()
+
+# Loads a texture, or returns the image that it has already been loaded into
+# Every file is reloaded from disk at most once per import, or once per session if loaded textures are reused
+# Textures that have been decoded in the background are copied into a new image instead, once their decoding is done
+def loadTexture(texName, texture_ext, TextureDecodes):
+    global TexturesLoaded, TexturesReused, TexturesDecoded
+    texPath = findTexture(texName, texture_ext)
+    path = getTexturePath(texPath)
+    image = TextureImages.get(path)
+    if image is not None:
+        try:
+            image.name # Fails if the image has been removed since it was loaded
+            TexturesReused += 1
+            return image
+        except ReferenceError:
+            pass
+    decoded = None
+    if TextureDecodes is not None:
+        decoded = TextureDecodes.take(path)
+    image = None
+    if decoded is not None:
+        width, height, pixels = decoded
+        # Images made by an earlier import are filled again, instead of another copy being added
+        image = findImage(path)
+        if (image is not None and image.packed_file is None and image.source == 'FILE'):
+            # Images linked to the file are only reloaded, the same way as textures that aren't decoded in the background
+            image.reload()
+            TexturesLoaded += 1
+        else:
+            if (image is None or tuple(image.size) != (width, height)):
+                image = bpy.data.images.new(os.path.basename(texPath), width, height, alpha=True)
+                image.filepath_raw = texPath
+            image.pixels.foreach_set(np.multiply(pixels, 1 / 255, dtype=np.float32))
+            # The image isn't read from its file, so it's packed to be saved along with the .blend file
+            packImage(image)
+            TexturesDecoded += 1
+    if image is None:
+        image = image_utils.load_image(texPath, place_holder=True, check_existing=True, force_reload=True)
+        TexturesLoaded += 1
+    TextureImages[path] = image
+    return image
+
+# Finds out how the alpha channel of a texture is used from its pixels (as RGBA floats)
+# Returns 'OPAQUE' if no pixel is transparent, 'CLIP' if almost every pixel is either opaque or fully transparent, or else 'HASHED'
+def analyzeAlpha(pixels):
+    alpha = pixels[3::4]
+    if (alpha.size == 0 or alpha.min() >= 254 / 255):
+        return 'OPAQUE'
+    partial = np.count_nonzero((alpha > 1 / 255) & (alpha < 254 / 255))
+    if (partial <= alpha.size * ALPHA_CLIP_TOLERANCE):
+        return 'CLIP'
+    return 'HASHED'
+
+# Returns how the alpha channel of a loaded texture is used, or None if its file can't be found
+# Every file is only analyzed once for as long as it's unchanged; results are also kept in the decode cache directory, by the contents of the file
+def getAlphaUsage(image, texPath):
+    path = getTexturePath(texPath)
+    try:
+        st = os.stat(texPath)
+    except OSError:
+        return None
+    cached = TextureAlpha.get(path)
+    if (cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns)):
+        return cached[2]
+    found, usage = DecodedFiles.get(texPath, "analyzeAlpha", ())
+    if not found:
+        width, height = image.size
+        if (width == 0 or height == 0):
+            return None
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+        usage = analyzeAlpha(pixels)
+        DecodedFiles.put(texPath, "analyzeAlpha", (), usage)
+    TextureAlpha[path] = (st.st_size, st.st_mtime_ns, usage)
+    return usage
 
-        print(Materials_array)
+# Imports the materials
+# Returns the node group that combines the textures of a material, which is shared by every material using the same maps
+# The group is only built the first time a combination of maps is used, and is then reused by later imports as well
+def getMaterialGroup(use_normal, use_emissive, use_prm, use_color2, use_alpha):
+    features = [name for name, used in (("Normal", use_normal), ("Emissive", use_emissive), ("PRM", use_prm), ("Color 2", use_color2), ("Alpha", use_alpha)) if used]
+    groupName = "SSBU Material"
+    if features:
+        groupName += " (" + ", ".join(features) + ")"
+    if (bpy.data.node_groups.find(groupName) >= 0):
+        return bpy.data.node_groups[groupName]
+
+    group = bpy.data.node_groups.new(groupName, 'ShaderNodeTree')
+    group.use_fake_user = True
+    # The sockets are added first, so that the input and output nodes have them as soon as they are created
+    group.inputs.new("NodeSocketColor", "Color 1")
+    group.outputs.new("NodeSocketColor", "Base Color")
+    if use_alpha:
+        group.inputs.new("NodeSocketFloat", "Alpha 1")
+        group.outputs.new("NodeSocketFloat", "Alpha")
+    if use_normal:
+        group.inputs.new("NodeSocketColor", "Normal Map")
+        group.outputs.new("NodeSocketVector", "Normal")
+    if use_emissive:
+        group.inputs.new("NodeSocketColor", "Emissive Map")
+        group.outputs.new("NodeSocketColor", "Emission")
+    if use_prm:
+        group.inputs.new("NodeSocketColor", "PRM Map")
+        group.inputs.new("NodeSocketFloat", "PRM Alpha")
+        group.outputs.new("NodeSocketFloat", "Metallic")
+        group.outputs.new("NodeSocketFloat", "Roughness")
+        group.outputs.new("NodeSocketFloat", "Specular")
+    if use_color2:
+        group.inputs.new("NodeSocketColor", "Color 2")
+        group.inputs.new("NodeSocketFloat", "Alpha 2")
+
+    nodes = group.nodes
+    links = group.links
+    group_in = nodes.new(type="NodeGroupInput")
+    group_in.location = (-600, 0)
+    group_out = nodes.new(type="NodeGroupOutput")
+    group_out.location = (400, 0)
+    base_color = group_in.outputs["Color 1"]
+
+    if use_alpha:
+        links.new(group_in.outputs["Alpha 1"], group_out.inputs["Alpha"])
+
+    if use_normal:
+        nor_in_node = nodes.new(type="ShaderNodeSeparateRGB")
+        links.new(group_in.outputs["Normal Map"], nor_in_node.inputs["Image"])
+
+        # The blue channel holds the blend map, so it's replaced
+        nor_out_node = nodes.new(type="ShaderNodeCombineRGB")
+        links.new(nor_in_node.outputs["R"], nor_out_node.inputs["R"])
+        links.new(nor_in_node.outputs["G"], nor_out_node.inputs["G"])
+        nor_out_node.inputs["B"].default_value = 1.0
+
+        nor_node = nodes.new(type="ShaderNodeNormalMap")
+        links.new(nor_out_node.outputs["Image"], nor_node.inputs["Color"])
+        nor_node.uv_map = "UVMap"
+        links.new(nor_node.outputs["Normal"], group_out.inputs["Normal"])
+
+    if use_emissive:
+        links.new(group_in.outputs["Emissive Map"], group_out.inputs["Emission"])
+
+    if use_prm:
+        prm_node = nodes.new(type="ShaderNodeSeparateRGB")
+        links.new(group_in.outputs["PRM Map"], prm_node.inputs["Image"])
+        links.new(prm_node.outputs["R"], group_out.inputs["Metallic"])
+        links.new(prm_node.outputs["G"], group_out.inputs["Roughness"])
+        links.new(group_in.outputs["PRM Alpha"], group_out.inputs["Specular"])
+
+        # The ambient occlusion darkens the base color
+        ao_node = nodes.new(type="ShaderNodeMixRGB")
+        ao_node.blend_type = 'MULTIPLY'
+        links.new(base_color, ao_node.inputs["Color1"])
+        links.new(prm_node.outputs["B"], ao_node.inputs["Color2"])
+        ao_node.inputs["Fac"].default_value = 1.0
+        base_color = ao_node.outputs["Color"]
+
+    if use_color2:
+        mix_node = nodes.new(type="ShaderNodeMixRGB")
+        links.new(group_in.outputs["Alpha 2"], mix_node.inputs[0])
+        links.new(base_color, mix_node.inputs[1])
+        links.new(group_in.outputs["Color 2"], mix_node.inputs[2])
+        base_color = mix_node.outputs[0]
+
+    links.new(base_color, group_out.inputs["Base Color"])
+    return group
+
+# Creates a material read from the material file, and returns it
+def importMaterial(pe, use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext, TextureDecodes):
+    # Check and reuse existing same-name material, or create it if it doesn't already exist
+    if (bpy.data.materials.find(pe.materialName) > 0):
+        mat = bpy.data.materials[pe.materialName]
+    else:
+        mat = bpy.data.materials.new(pe.materialName)
+    mat.use_fake_user = True
+    mat.use_backface_culling  = True
+    mat.use_nodes = True
+    mat.blend_method = 'OPAQUE'
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+
+    principled_node = nodes[0]
+    assert principled_node.type == 'BSDF_PRINCIPLED'
+    x, y = principled_node.location
+    # Make it less shiny
+    principled_node.inputs["Specular"].default_value = 0
+    principled_node.inputs["Roughness"].default_value = 1
+
+    if (pe.color1Name != ""):
+        use_normal = use_normal_maps and pe.normalName != ""
+        use_emissive = use_emissive_maps and pe.emissive1Name != ""
+        use_prm = use_prm_maps and pe.prmName != ""
+        use_color2 = pe.color2Name != ""
+        # 'alp_' should be rendered with alpha
+        # 'def_', 'skin_' should not be rendered with alpha
+        use_alpha = ("alp" in pe.materialName) or ("head" in pe.materialName) or ("mouth" in pe.materialName) or ("facial" in pe.materialName) or ("AZA" in pe.materialName) \
+        or ("alp" in pe.color1Name) or ("head" in pe.color1Name) or ("mouth" in pe.color1Name) or ("facial" in pe.color1Name) or ("AZA" in pe.color1Name)
+
+        # tex_fname_1 is the diffuse texture.
+        # May have transparency.
+        # Check and reuse existing same-name primary texture slot, or create it if it doesn't already exist
+        tex_fname_1 = loadTexture(pe.color1Name, texture_ext, TextureDecodes)
+        alpha_usage = None
+        if use_alpha:
+            # Textures without any transparent pixels are drawn opaque, as hashed transparency is much slower to render
+            tex_fname_1.alpha_mode = 'STRAIGHT'
+            alpha_usage = getAlphaUsage(tex_fname_1, findTexture(pe.color1Name, texture_ext))
+            use_alpha = alpha_usage != 'OPAQUE'
+        if not use_alpha:
+            tex_fname_1.alpha_mode = 'NONE'
+
+        # Everything between the textures and the shader is shared by all materials using the same maps
+        group_node = nodes.new(type="ShaderNodeGroup")
+        group_node.node_tree = getMaterialGroup(use_normal, use_emissive, use_prm, use_color2, use_alpha)
+        group_node.location = (x - 300, y)
+        links.new(group_node.outputs["Base Color"], principled_node.inputs["Base Color"])
+
+        tex1_node = nodes.new(type="ShaderNodeTexImage")
+        tex1_node.image = tex_fname_1
+        links.new(tex1_node.outputs["Color"], group_node.inputs["Color 1"])
+
+        if use_alpha:
+            # Textures that couldn't be analyzed keep hashed transparency
+            mat.blend_method = alpha_usage or 'HASHED'
+            links.new(tex1_node.outputs["Alpha"], group_node.inputs["Alpha 1"])
+            links.new(group_node.outputs["Alpha"], principled_node.inputs["Alpha"])
+
+        uvmap_node = nodes.new(type="ShaderNodeUVMap")
+        uvmap_node.uv_map = "UVMap" # first UV map for first texture
+        links.new(uvmap_node.outputs[0], tex1_node.inputs["Vector"])
+
+        # nor_fname_1 is the normal map.
+        # R - Normal X+
+        # G - Normal Y+
+        # B - Blend Map (unused)
+        # A - Cavity Map (unused)
+        if use_normal:
+            nor_fname_1 = loadTexture(pe.normalName, texture_ext, TextureDecodes)
+            nor_fname_1.colorspace_settings.name = 'Non-Color'
+
+            nor_tex_node = nodes.new(type="ShaderNodeTexImage")
+            nor_tex_node.image = nor_fname_1
+            links.new(uvmap_node.outputs[0], nor_tex_node.inputs["Vector"])
+            links.new(nor_tex_node.outputs["Color"], group_node.inputs["Normal Map"])
+            links.new(group_node.outputs["Normal"], principled_node.inputs["Normal"])
+
+        # emi_fname_1 is the emissive map.
+        # Support for one emissive map, not two, is currently implemented.
+        if use_emissive:
+            emi_fname_1 = loadTexture(pe.emissive1Name, texture_ext, TextureDecodes)
+
+            emi_node = nodes.new(type="ShaderNodeTexImage")
+            emi_node.image = emi_fname_1
+            links.new(uvmap_node.outputs[0], emi_node.inputs["Vector"])
+            links.new(emi_node.outputs["Color"], group_node.inputs["Emissive Map"])
+            links.new(group_node.outputs["Emission"], principled_node.inputs["Emission"])
+
+        # prm_fname_1 is the PRM map, (Physically-based Rendering Map), with these channels:
+        # Red - mtl (Metallic)
+        # Green - rgh (Roughness)
+        # Blue - ao (Ambient Occlusion)
+        # Alpha - spc (Specular)
+        if use_prm:
+            prm_fname_1 = loadTexture(pe.prmName, texture_ext, TextureDecodes)
+
+            prm_tex_node = nodes.new(type="ShaderNodeTexImage")
+            prm_tex_node.image = prm_fname_1
+            links.new(uvmap_node.outputs[0], prm_tex_node.inputs["Vector"])
+            links.new(prm_tex_node.outputs["Color"], group_node.inputs["PRM Map"])
+            links.new(prm_tex_node.outputs["Alpha"], group_node.inputs["PRM Alpha"])
+            links.new(group_node.outputs["Metallic"], principled_node.inputs["Metallic"])
+            links.new(group_node.outputs["Roughness"], principled_node.inputs["Roughness"])
+            links.new(group_node.outputs["Specular"], principled_node.inputs["Specular"])
+
+        if use_color2:
+            # tex_fname_2 is overlaid on top of tex_fname_1
+            # No transparency for tex_fname_1.
+            # Check and reuse existing same-name secondary texture slot, or create it if it doesn't already exist
+            tex_fname_2 = loadTexture(pe.color2Name, texture_ext, TextureDecodes)
+
+            tex2_node = nodes.new(type="ShaderNodeTexImage")
+            tex2_node.image = tex_fname_2
+
+            uvmap_node = nodes.new(type="ShaderNodeUVMap")
+            uvmap_node.uv_map = "UVMap.001" # second UV map for second texture
+            links.new(uvmap_node.outputs[0], tex2_node.inputs["Vector"])
+            links.new(tex2_node.outputs["Color"], group_node.inputs["Color 2"])
+            links.new(tex2_node.outputs["Alpha"], group_node.inputs["Alpha 2"])
+    return mat
+
+# Returns the material that a polygon group uses, which is only created the first time a mesh uses it
+# Returns None if the material can't be found
+def getMaterial(matName, use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext, TextureDecodes):
+    if matName is None:
+        return None
+    # Blender cuts names down to 63 characters
+    matName = matName[:63]
+    if matName in MaterialInfo:
+        if matName not in MaterialsBuilt:
+            MaterialsBuilt[matName] = importMaterial(MaterialInfo[matName], use_emissive_maps, use_prm_maps, use_normal_maps, texture_ext, TextureDecodes)
+        return MaterialsBuilt[matName]
+    # Materials that aren't in the material file may still have been created by an earlier import
+    return bpy.data.materials.get(matName)
 
 # Imports the skeleton
-def importSkeleton(context, SKTName, create_rest_action):
-    BoneCount = 0
-    BoneParent_array = []
-    BoneName_array = []
+# Creates the armature from the bones read by readSkeleton()
+def importSkeleton(context, skeleton, create_rest_action):
+    BoneName_array, BoneParent_array, BoneMatrix_array = skeleton
+    BoneCount = len(BoneName_array)
     global BoneTrsArray; BoneTrsArray = {}
 
-    with open(SKTName, 'rb') as b:
-        b.seek(0x10, 0)
-        BoneCheck = struct.unpack('<L', b.read(4))[0]
-        if (BoneCheck == 0x534B454C):
-            SkelVerA = struct.unpack('<H', b.read(2))[0]
-            SkelVerB = struct.unpack('<H', b.read(2))[0]
-            b.seek(0x18, 0)
-            BoneOffset = b.tell() + struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneCount = struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneMatrOffset = b.tell() + struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneMatrCount = struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneInvMatrOffset = b.tell() + struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneInvMatrCount = struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneRelMatrOffset = b.tell() + struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneRelMatrCount = struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneRelMatrInvOffset = b.tell() + struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            BoneRelMatrInvCount = struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-            b.seek(BoneOffset, 0)
-
-            for c in range(BoneCount):
-                BoneNameOffset = b.tell() + struct.unpack('<L', b.read(4))[0]; b.seek(0x04, 1)
-                BoneRet = b.tell()
-                b.seek(BoneNameOffset, 0)
-                BoneName = readVarLenString(b)
-                b.seek(BoneRet, 0)
-                BoneID = struct.unpack('<H', b.read(2))[0]
-                BoneParent = struct.unpack('<H', b.read(2))[0]
-                BoneUnk = struct.unpack('<L', b.read(4))[0]
-                BoneParent_array.append(BoneParent)
-                BoneName_array.append(BoneName)
-
-            print("Total number of bones found: " + str(BoneCount))
-            print(BoneParent_array)
-            print(BoneName_array)
-
-            b.seek(BoneMatrOffset, 0)
-            # Before adding the bones, create a new armature and select it
-            global skelName
-            skelName = MODLName + "-armature"
-            skel = bpy.data.objects.new(skelName, bpy.data.armatures.new(skelName))
-            global armaName # Used in case another armature of the same name exists
-            armaName = skel.data.name
-            skel.rotation_mode = 'QUATERNION'
-            skel.data.display_type = 'STICK'
-            skel.show_in_front = True
-
-            context.view_layer.active_layer_collection.collection.objects.link(skel)
-            for i in bpy.context.selected_objects:
-                i.select_set(False)
-            skel.select_set(True)
-            context.view_layer.objects.active = skel
-            bpy.ops.object.mode_set(mode='EDIT', toggle=False)
-
-            for c in range(BoneCount):
-                # Matrix format is [X, Y, Z, W]
-                m11 = struct.unpack('<f', b.read(4))[0]; m12 = struct.unpack('<f', b.read(4))[0]; m13 = struct.unpack('<f', b.read(4))[0]; m14 = struct.unpack('<f', b.read(4))[0]
-                m21 = struct.unpack('<f', b.read(4))[0]; m22 = struct.unpack('<f', b.read(4))[0]; m23 = struct.unpack('<f', b.read(4))[0]; m24 = struct.unpack('<f', b.read(4))[0]
-                m31 = struct.unpack('<f', b.read(4))[0]; m32 = struct.unpack('<f', b.read(4))[0]; m33 = struct.unpack('<f', b.read(4))[0]; m34 = struct.unpack('<f', b.read(4))[0]
-                m41 = struct.unpack('<f', b.read(4))[0]; m42 = struct.unpack('<f', b.read(4))[0]; m43 = struct.unpack('<f', b.read(4))[0]; m44 = struct.unpack('<f', b.read(4))[0]
-
-                mr0 = [m11, m21, m31, m41]
-                mr1 = [m12, m22, m32, m42]
-                mr2 = [m13, m23, m33, m43]
-                mr3 = [m14, m24, m34, m44]
-                tfm = mathutils.Matrix([mr0, mr1, mr2, mr3])
-                BoneTrsArray[BoneName_array[c]] = tfm
-                # print("Matrix for " + BoneName_array[c] + ":\n" + str(tfm))
-                # print(tfm.decompose())
-
-                newBone = skel.data.edit_bones.new(BoneName_array[c])
-                newBone.transform(tfm, scale=True, roll=False)
-
-                # Bones must a be non-zero length, or Blender will eventually remove them
-                newBone.tail = (newBone.head.x, newBone.head.y + 0.001, newBone.head.z)
-                newBone.use_deform = True
-                newBone.use_inherit_rotation = True
-                newBone.use_inherit_scale = True
-
-                # Store the original matrix rows as custom properties in bones so that they can be reused during animation transformation
-                newBone['matrow0'] = mr0
-                newBone['matrow1'] = mr1
-                newBone['matrow2'] = mr2
-                newBone['matrow3'] = mr3
-
-            # Apply parents now that all bones exist
-            for bc in range(BoneCount):
-                currBone = skel.data.edit_bones[BoneName_array[bc]]
-                if (BoneParent_array[bc] != 65535):
-                    try:
-                        currBone.parent = skel.data.edit_bones[BoneName_array[BoneParent_array[bc]]]
-                    except:
-                        # If parent bone can't be found
-                        continue
-
-            # Calculate the length for every bone, so that they will not be removed
-            maxs = [0, 0, 0]
-            mins = [0, 0, 0]
-            for bone in BoneName_array:
-                for i in range(3):
-                        maxs[i] = max(maxs[i], BoneTrsArray[bone].to_translation()[i])
-                        mins[i] = min(mins[i], BoneTrsArray[bone].to_translation()[i])
-            # Get armature dimensions
-            dimensions = []
-            for i in range(3):
-                dimensions.append(maxs[i] - mins[i])
-
-            length = max(0.001, (dimensions[0] + dimensions[1] + dimensions[2]) / 600) # very small indeed, but usage of the stick visualization still lets the bones be reasonably visible
-
-            for bone in skel.data.edit_bones:
-                bone.matrix = BoneTrsArray[bone.name]
-                bone.tail = bone.head + (bone.tail - bone.head).normalized() * length
-
-            if create_rest_action:
-                # Enter pose mode, and then create an action containing the rest pose if enabled
-                bpy.ops.object.mode_set(mode='POSE', toggle=False)
-                actionName = MODLName + "-rest"
-                action = bpy.data.actions.new(actionName)
-                action.pose_markers.new(actionName)
-
-                try:
-                    skel.animation_data.action
-                except:
-                    skel.animation_data_create()
-
-                skel.animation_data.action = action
-                skel.animation_data.action.use_fake_user = True
-                context.scene.frame_current = context.scene.frame_start # Jump to beginning of new action
-
-                for bone in skel.pose.bones:
-                    bone.matrix_basis.identity()
-                    bone.rotation_mode = 'QUATERNION'
-
-                    # First, create position keyframes
-                    skel.keyframe_insert(data_path='pose.bones["%s"].%s' %
-                                       (bone.name, "location"),
-                                       frame=context.scene.frame_current,
-                                       group=actionName)
-
-                    # Next, create rotation keyframes
-                    skel.keyframe_insert(data_path='pose.bones["%s"].%s' %
-                                       (bone.name, "rotation_quaternion"),
-                                       frame=context.scene.frame_current,
-                                       group=actionName)
-
-                    # Last, create scale keyframes
-                    skel.keyframe_insert(data_path='pose.bones["%s"].%s' %
-                                       (bone.name, "scale"),
-                                       frame=context.scene.frame_current,
-                                       group=actionName)
-
-            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+    # Before adding the bones, create a new armature and select it
+    global skelName
+    skelName = MODLName + "-armature"
+    skel = bpy.data.objects.new(skelName, bpy.data.armatures.new(skelName))
+    global armaName # Used in case another armature of the same name exists
+    armaName = skel.data.name
+    skel.rotation_mode = 'QUATERNION'
+    skel.data.display_type = 'STICK'
+    skel.show_in_front = True
+
+    context.view_layer.active_layer_collection.collection.objects.link(skel)
+    for i in bpy.context.selected_objects:
+        i.select_set(False)
+    skel.select_set(True)
+    context.view_layer.objects.active = skel
+    bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+
+    for c in range(BoneCount):
+        # Matrix format is [X, Y, Z, W]
+        m11, m12, m13, m14, m21, m22, m23, m24, m31, m32, m33, m34, m41, m42, m43, m44 = BoneMatrix_array[c]
+
+        mr0 = [m11, m21, m31, m41]
+        mr1 = [m12, m22, m32, m42]
+        mr2 = [m13, m23, m33, m43]
+        mr3 = [m14, m24, m34, m44]
+        tfm = mathutils.Matrix([mr0, mr1, mr2, mr3])
+        BoneTrsArray[BoneName_array[c]] = tfm
+        # print("Matrix for " + BoneName_array[c] + ":\n" + str(tfm))
+        # print(tfm.decompose())
+
+        newBone = skel.data.edit_bones.new(BoneName_array[c])
+        newBone.transform(tfm, scale=True, roll=False)
+
+        # Bones must a be non-zero length, or Blender will eventually remove them
+        newBone.tail = (newBone.head.x, newBone.head.y + 0.001, newBone.head.z)
+        newBone.use_deform = True
+        newBone.use_inherit_rotation = True
+        newBone.use_inherit_scale = True
+
+        # Store the original matrix rows as custom properties in bones so that they can be reused during animation transformation
+        newBone['matrow0'] = mr0
+        newBone['matrow1'] = mr1
+        newBone['matrow2'] = mr2
+        newBone['matrow3'] = mr3
+
+    # Apply parents now that all bones exist
+    for bc in range(BoneCount):
+        currBone = skel.data.edit_bones[BoneName_array[bc]]
+        if (BoneParent_array[bc] != 65535):
+            try:
+                currBone.parent = skel.data.edit_bones[BoneName_array[BoneParent_array[bc]]]
+            except:
+                # If parent bone can't be found
+                continue
+
+    # Calculate the length for every bone, so that they will not be removed
+    maxs = [0, 0, 0]
+    mins = [0, 0, 0]
+    for bone in BoneName_array:
+        for i in range(3):
+                maxs[i] = max(maxs[i], BoneTrsArray[bone].to_translation()[i])
+                mins[i] = min(mins[i], BoneTrsArray[bone].to_translation()[i])
+    # Get armature dimensions
+    dimensions = []
+    for i in range(3):
+        dimensions.append(maxs[i] - mins[i])
+
+    length = max(0.001, (dimensions[0] + dimensions[1] + dimensions[2]) / 600) # very small indeed, but usage of the stick visualization still lets the bones be reasonably visible
+
+    for bone in skel.data.edit_bones:
+        bone.matrix = BoneTrsArray[bone.name]
+        bone.tail = bone.head + (bone.tail - bone.head).normalized() * length
+
+    if create_rest_action:
+        # Enter pose mode, and then create an action containing the rest pose if enabled
+        bpy.ops.object.mode_set(mode='POSE', toggle=False)
+        actionName = MODLName + "-rest"
+        action = bpy.data.actions.new(actionName)
+        action.pose_markers.new(actionName)
+
+        try:
+            skel.animation_data.action
+        except:
+            skel.animation_data_create()
+
+        skel.animation_data.action = action
+        skel.animation_data.action.use_fake_user = True
+        context.scene.frame_current = context.scene.frame_start # Jump to beginning of new action
+
+        for bone in skel.pose.bones:
+            bone.matrix_basis.identity()
+            bone.rotation_mode = 'QUATERNION'
+
+            # First, create position keyframes
+            skel.keyframe_insert(data_path='pose.bones["%s"].%s' %
+                               (bone.name, "location"),
+                               frame=context.scene.frame_current,
+                               group=actionName)
+
+            # Next, create rotation keyframes
+            skel.keyframe_insert(data_path='pose.bones["%s"].%s' %
+                               (bone.name, "rotation_quaternion"),
+                               frame=context.scene.frame_current,
+                               group=actionName)
+
+            # Last, create scale keyframes
+            skel.keyframe_insert(data_path='pose.bones["%s"].%s' %
+                               (bone.name, "scale"),
+                               frame=context.scene.frame_current,
+                               group=actionName)
+
+    bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+
+    # Index every bone once, in the order used by the armature and its vertex groups, so that meshes can look them up by name
+    for boneIndex, bone in enumerate(skel.data.bones):
+        BoneIDArray[bone.name] = boneIndex
 
 # Imports the meshes
-def importMeshes(context, MSHName, texture_ext, use_vertex_colors, use_uv_maps, allow_black):
-    PolyGrp_array = []
-    WeightGrp_array = []
-
-    with open(MSHName, 'rb') as f:
-        time_start = time.time()
-        f.seek(0x10, 0)
-        MSHCheck = struct.unpack('<L', f.read(4))[0]
-        if (MSHCheck == 0x4D455348):
-            MeshVerA = struct.unpack('<H', f.read(2))[0]
-            MeshVerB = struct.unpack('<H', f.read(2))[0]
-            f.seek(0x88, 0)
-            PolyGrpInfOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            PolyGrpCount = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            UnkOffset1 = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            UnkCount1 = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            FaceBuffSizeB = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            VertBuffOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            UnkCount2 = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            FaceBuffOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            FaceBuffSize = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            WeightBuffOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            WeightCount = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-
-            f.seek(PolyGrpInfOffset, 0)
-            nameCounter = 0
-            for g in range(PolyGrpCount):
-                ge = PolygonGroupData()
-                VisGrpNameOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x08, 1)
-                Unk1 = struct.unpack('<L', f.read(4))[0]
-                SingleBindNameOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                ge.verticeCount = struct.unpack('<L', f.read(4))[0]
-                ge.facepointCount = struct.unpack('<L', f.read(4))[0]
-                Unk2 = struct.unpack('<L', f.read(4))[0] # Always 3?
-                ge.verticeStart = struct.unpack('<L', f.read(4))[0]
-                ge.UVStart = struct.unpack('<L', f.read(4))[0]
-                UnkOff1 = struct.unpack('<L', f.read(4))[0]
-                Unk3 = struct.unpack('<L', f.read(4))[0] # Always 0?
-                ge.verticeStride = struct.unpack('<L', f.read(4))[0]
-                ge.UVStride = struct.unpack('<L', f.read(4))[0]
-                Unk4 = struct.unpack('<L', f.read(4))[0] # Either 0 or 32
-                Unk5 = struct.unpack('<L', f.read(4))[0] # Always 0
-                ge.facepointStart = struct.unpack('<L', f.read(4))[0]
-                Unk6 = struct.unpack('<L', f.read(4))[0] # Always 4
-                ge.faceLongBit = struct.unpack('<L', f.read(4))[0] # Either 0 or 1
-                Unk8 = struct.unpack('<L', f.read(4))[0] # Either 0 or 1
-                SortPriority = struct.unpack('<L', f.read(4))[0]
-                Unk9 = struct.unpack('<L', f.read(4))[0] # 0, 1, 256 or 257
-                f.seek(0x64, 1) # A bunch of unknown float values.
-                ge.bufferParamStart = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                ge.bufferParamCount = struct.unpack('<L', f.read(4))[0]
-                Unk10 = struct.unpack('<L', f.read(4))[0] # Always 0
-                PolyGrpRet = f.tell()
-                f.seek(VisGrpNameOffset, 0)
-                visGroupBuffer = readVarLenString(f)
-                if (len(PolyGrp_array) > 0 and (PolyGrp_array[g - 1].visGroupName == visGroupBuffer or PolyGrp_array[g - 1].visGroupName[:-4] == visGroupBuffer)):
-                    nameCounter += 1
-                    ge.visGroupName = visGroupBuffer + str(nameCounter * .001)[1:]
-                else:
-                    ge.visGroupName = visGroupBuffer
-                    nameCounter = 0
-                f.seek(SingleBindNameOffset, 0)
-                ge.singleBindName = readVarLenString(f)
-                PolyGrp_array.append(ge)
-                f.seek(PolyGrpRet, 0)
-
-            print(PolyGrp_array)
-
-            f.seek(VertBuffOffset, 0)
-            VertOffStart = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            VertBuffSize = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            UVOffStart = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-            UVBuffSize = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-
-            f.seek(WeightBuffOffset, 0)
-            nameCounter = 0
-            for b in range(WeightCount):
-                be = WeightGroupData()
-                GrpNameOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                be.subGroupNum = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                be.weightInfMax = struct.unpack('<B', f.read(1))[0]
-                be.weightFlag2 = struct.unpack('<B', f.read(1))[0]
-                be.weightFlag3 = struct.unpack('<B', f.read(1))[0]
-                be.weightFlag4 = struct.unpack('<B', f.read(1))[0]
-                f.seek(0x04, 1)
-                be.rigInfOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                be.rigInfCount = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                WeightRet = f.tell()
-                f.seek(GrpNameOffset, 0)
-                groupNameBuffer = readVarLenString(f)
-                if (len(WeightGrp_array) > 0 and (WeightGrp_array[b - 1].groupName == groupNameBuffer or WeightGrp_array[b - 1].groupName[:-4] == groupNameBuffer)):
-                    nameCounter += 1
-                    be.groupName = groupNameBuffer + str(nameCounter * .001)[1:]
-                else:
-                    be.groupName = groupNameBuffer
-                    nameCounter = 0
-                WeightGrp_array.append(be)
-                f.seek(WeightRet, 0)
-
-            print(WeightGrp_array)
-
-            # Repeats for every mesh group
-            for p in range(PolyGrpCount):
-                Vert_array = []
-                Normal_array = []
-                Color_array = {}
-                Alpha_array = {}
-                UV_array = {}
-                Face_array = []
-                Weight_array = []
-                SingleBindID = 0
-
-                # Add the meshes into Blender
-                mesh =  bpy.data.meshes.new(PolyGrp_array[p].visGroupName)
-                obj = bpy.data.objects.new(PolyGrp_array[p].visGroupName, mesh)
-                obj.rotation_mode = 'QUATERNION'
-
-                try:
-                    if (len(MODLGrp_array[PolyGrp_array[p].visGroupName]) > 63):
-                        mesh.materials.append(bpy.data.materials[MODLGrp_array[PolyGrp_array[p].visGroupName][:63]])
-                    else:
-                        mesh.materials.append(bpy.data.materials[MODLGrp_array[PolyGrp_array[p].visGroupName]])
-                except:
-                    # In case material cannot be found
-                    continue
-                mesh.use_auto_smooth = True
-
-                try:
-                    obj.parent = bpy.data.objects[armaName]
-                    for bone in bpy.data.armatures[armaName].bones.values():
-                        obj.vertex_groups.new(name=bone.name)
-                    modifier = obj.modifiers.new(armaName, type="ARMATURE")
-                    modifier.object = bpy.data.objects[armaName]
-                except:
-                    # If model does not have a skeleton
-                    print(MODLName + " does not have an armature, skip parenting " + PolyGrp_array[p].visGroupName)
-
-                # Begin reading mesh data
-                f.seek(PolyGrp_array[p].bufferParamStart, 0)
-
-                PosFmt = 0; NormFmt = 0; TanFmt = 0; ColorCount = 0; UVCount = 0
-
-                for v in range(PolyGrp_array[p].bufferParamCount):
-                    BuffParamType = struct.unpack('<L', f.read(4))[0]
-                    BuffParamFmt = struct.unpack('<L', f.read(4))[0]
-                    BuffParamSet = struct.unpack('<L', f.read(4))[0]
-                    BuffParamOffset = struct.unpack('<L', f.read(4))[0]
-                    BuffParamLayer = struct.unpack('<L', f.read(4))[0]
-                    BuffParamUnk1 = struct.unpack('<L', f.read(4))[0] # always 0?
-                    BuffParamStrOff1 = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                    BuffParamStrOff2 = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                    BuffParamUnk2 = struct.unpack('<L', f.read(4))[0] # always 1?
-                    BuffParamUnk3 = struct.unpack('<L', f.read(4))[0] # always 0?
-                    BuffParamRet = f.tell()
-                    f.seek(BuffParamStrOff2, 0)
-                    BuffNameOff = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 0)
-                    f.seek(BuffNameOff, 0)
-                    BuffName = readVarLenString(f)
-                    if (BuffName == "Position0"):
-                        PosFmt = BuffParamFmt
-                    elif (BuffName == "Normal0"):
-                        NormFmt = BuffParamFmt
-                    elif (BuffName == "Tangent0"):
-                        TanFmt = BuffParamFmt
-                    elif (BuffName == "map1" or BuffName == "uvSet" or BuffName == "uvSet1" or BuffName == "uvSet2" or BuffName == "bake1"):
-                        UV_array[UVCount] = []
-                        UVCount += 1
-                    elif (BuffName == "colorSet1" or BuffName == "colorSet2" or BuffName == "colorSet2_1" or BuffName == "colorSet2_2" or BuffName == "colorSet2_3" or BuffName == "colorSet3" or BuffName == "colorSet4" or BuffName == "colorSet5" or BuffName == "colorSet6" or BuffName == "colorSet7"):
-                        Color_array[ColorCount] = []
-                        Alpha_array[ColorCount] = []
-                        ColorCount += 1
-
-                    else:
-                        raise RuntimeError("Unknown format!")
-                    f.seek(BuffParamRet, 0)
-
-                # Read vertice data
-                print("Total number of vertices found: " + str(PolyGrp_array[p].verticeCount))
-                f.seek(VertOffStart + PolyGrp_array[p].verticeStart, 0)
-
-                print(PolyGrp_array[p].visGroupName + " Vert start: " + str(f.tell()))
-                for v in range(PolyGrp_array[p].verticeCount):
-                    if (PosFmt == 0):
-                        vx = struct.unpack('<f', f.read(4))[0]
-                        vy = struct.unpack('<f', f.read(4))[0]
-                        vz = struct.unpack('<f', f.read(4))[0]
-                        Vert_array.append([vx,vy,vz])
-                    else:
-                        print("Unknown position format!")
-                    if (NormFmt == 5):
-                        nx = decompressHalfFloat(f.read(2))
-                        ny = decompressHalfFloat(f.read(2))
-                        nz = decompressHalfFloat(f.read(2))
-                        nq = decompressHalfFloat(f.read(2))
-                        Normal_array.append([nx,ny,nz])
-                    else:
-                        print("Unknown normals format!")
-                    if (TanFmt == 5):
-                        tanx = decompressHalfFloat(f.read(2))
-                        tany = decompressHalfFloat(f.read(2))
-                        tanz = decompressHalfFloat(f.read(2))
-                        tanq = decompressHalfFloat(f.read(2))
-                    else:
-                        print("Unknown tangents format!")
-
-                print(PolyGrp_array[p].visGroupName + " Vert end: " + str(f.tell()))
-
-                f.seek(UVOffStart + PolyGrp_array[p].UVStart, 0)
-                print(PolyGrp_array[p].visGroupName + " UV start: " + str(f.tell()))
-                for v in range(PolyGrp_array[p].verticeCount):
-                    # Read UV map data if option is enabled
-                    if (use_uv_maps and UVCount >= 1):
-                        for uv in range(UVCount):
-                            tu = decompressHalfFloat(f.read(2))
-                            tv = (decompressHalfFloat(f.read(2)) * -1) + 1
-                            UV_array[uv].append([tu, tv])
-
-                    # Read vertex color data if option is enabled
-                    if (use_vertex_colors and ColorCount >= 1):
-                        for color in range(ColorCount):
-                            colorr = float(struct.unpack('<B', f.read(1))[0]) / 128
-                            colorg = float(struct.unpack('<B', f.read(1))[0]) / 128
-                            colorb = float(struct.unpack('<B', f.read(1))[0]) / 128
-                            colora = float(struct.unpack('<B', f.read(1))[0]) / 128
-                            Color_array[color].append([colorr,colorg,colorb])
-                            Alpha_array[color].append(colora)
-
-                print(PolyGrp_array[p].visGroupName + " UV end: " + str(f.tell()))
-                # Search for duplicate UV coordinates and make them unique so that Blender will not remove them
-                if (use_uv_maps and len(UV_array) > 0):
-                    for uvmap in UV_array.values():
-                        for uvcoorda in range(0, len(uvmap) - 1):
-                            count = uvcoorda
-                            for uvcoordb in range(count + 1, len(uvmap)):
-                                if (uvmap[uvcoordb] == uvmap[uvcoorda]):
-                                    uvmap[uvcoordb][0] += 0.000000000000001
-                                    uvmap[uvcoordb][1] += 0.000000000000001
-
-                # Read face data
-                f.seek(FaceBuffOffset + PolyGrp_array[p].facepointStart, 0)
-                print(PolyGrp_array[p].visGroupName + " Face start: " + str(f.tell()))
-                for fc in range(int(PolyGrp_array[p].facepointCount / 3)):
-                    if (PolyGrp_array[p].faceLongBit == 0):
-                        fa = struct.unpack('<H', f.read(2))[0] + 1
-                        fb = struct.unpack('<H', f.read(2))[0] + 1
-                        fc = struct.unpack('<H', f.read(2))[0] + 1
-                        Face_array.append([fa,fb,fc])
-                    elif (PolyGrp_array[p].faceLongBit == 1):
-                        fa = struct.unpack('<L', f.read(4))[0] + 1
-                        fb = struct.unpack('<L', f.read(4))[0] + 1
-                        fc = struct.unpack('<L', f.read(4))[0] + 1
-                        Face_array.append([fa,fb,fc])
-                    else:
-                        raise RuntimeError("Unknown face bit value!")
-
-                print(PolyGrp_array[p].visGroupName + " Face end: " + str(f.tell()))
-
-                if (PolyGrp_array[p].singleBindName != ""):
-                    for b in range(len(bpy.data.armatures[armaName].bones)):
-                        if (PolyGrp_array[p].singleBindName == bpy.data.armatures[armaName].bones[b].name):
-                            SingleBindID = b
-
-                    for b in range(len(Vert_array)):
-                        Weight_array.append(WeightData([SingleBindID], [1.0]))
-                else:
-                    for b in range(len(Vert_array)):
-                        Weight_array.append(WeightData([], []))
-
-                    RigSet = 1
-                    for b in range(len(WeightGrp_array)):
-                            if (PolyGrp_array[p].visGroupName == WeightGrp_array[b].groupName):
-                                RigSet = b
-                                break
-                    # Read vertice/weight group data
-                    f.seek(WeightGrp_array[RigSet].rigInfOffset, 0)
-                    print(PolyGrp_array[p].visGroupName + " Rig info start: " + str(f.tell()))
-
-                    if (WeightGrp_array[RigSet].rigInfCount != 0):
-                        for x in range(WeightGrp_array[RigSet].rigInfCount):
-                            RigBoneNameOffset = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                            RigBuffStart = f.tell() + struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                            RigBuffSize = struct.unpack('<L', f.read(4))[0]; f.seek(0x04, 1)
-                            RigRet = f.tell()
-                            f.seek(RigBoneNameOffset, 0)
-                            RigBoneName = readVarLenString(f)
-                            f.seek(RigBuffStart, 0)
-                            RigBoneID = 0
-                            for b in range(len(bpy.data.armatures[armaName].bones)):
-                                if (RigBoneName == bpy.data.armatures[armaName].bones[b].name):
-                                    RigBoneID = b
-
-                            if (RigBoneID == 0) and len(bpy.data.armatures[armaName].bones) > 1:
-                                print(RigBoneName + " doesn't exist on " + PolyGrp_array[p].visGroupName + "! Transferring rigging to " + bpy.data.armatures[armaName].bones[1].name + ".")
-                                RigBoneID = 1
-
-                            for y in range(int(RigBuffSize / 0x06)):
-                                RigVertID = struct.unpack('<H', f.read(2))[0]
-                                RigValue = struct.unpack('<f', f.read(4))[0]
-                                Weight_array[RigVertID].boneIDs.append(RigBoneID)
-                                Weight_array[RigVertID].weights.append(RigValue)
-
-                            f.seek(RigRet, 0)
-
+# Creates the object and mesh of one decoded polygon group; must be run on the main thread
+# Returns whether the mesh was built, as polygon groups whose material can't be found are skipped
+def buildPolygonGroup(context, ge, dm, material, BoneNames):
+    # In case material cannot be found
+    if material is None:
+        return False
+
+    # Add the meshes into Blender
+    mesh =  bpy.data.meshes.new(ge.visGroupName)
+    obj = bpy.data.objects.new(ge.visGroupName, mesh)
+    obj.rotation_mode = 'QUATERNION'
+    mesh.materials.append(material)
+    mesh.use_auto_smooth = True
+
+    try:
+        obj.parent = bpy.data.objects[armaName]
+        modifier = obj.modifiers.new(armaName, type="ARMATURE")
+        modifier.object = bpy.data.objects[armaName]
+    except:
+        # If model does not have a skeleton
+        print(MODLName + " does not have an armature, skip parenting " + ge.visGroupName)
+
+    # Finally build the mesh, filling every array at once
+    mesh.vertices.add(len(dm.vertices))
+    mesh.vertices.foreach_set("co", dm.vertices.ravel())
+    mesh.loops.add(dm.faces.size)
+    mesh.loops.foreach_set("vertex_index", dm.faces.ravel())
+    mesh.polygons.add(len(dm.faces))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, dm.faces.size, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(dm.faces), 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+    for Colors in dm.colors:
+        mesh.vertex_colors.new(do_init=False).data.foreach_set("color", Colors)
+
+    for UVs in dm.uvs:
+        mesh.uv_layers.new(do_init=False).data.foreach_set("uv", UVs)
+
+    if (obj.parent is not None):
+        # Structure of this list is: [(bone index, vertex indices, weights)]
+        Weight_array = []
+        for boneName, vertices, weights in dm.weights:
+            if boneName is None:
+                boneID = 1
+            else:
+                boneID = BoneIDArray.get(boneName, 0)
+                # Rigging for bones that can't be found is transferred to the second bone
+                if dm.rigged and (boneID == 0) and len(BoneNames) > 1:
+                    print(boneName + " doesn't exist on " + ge.visGroupName + "! Transferring rigging to " + BoneNames[1] + ".")
+                    boneID = 1
+            Weight_array.append((boneID, vertices, weights))
+        assignWeights(obj.vertex_groups, BoneNames, Weight_array, len(dm.vertices))
+
+    context.view_layer.active_layer_collection.collection.objects.link(obj)
+
+    # Every polygon uses the polygon group's material, which is the first one on the mesh, and is smooth shaded
+    mesh.polygons.foreach_set("material_index", np.zeros(len(mesh.polygons), dtype=np.int32))
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+    mesh.update()
+
+    # Use the normals from the file as custom split normals, instead of the ones Blender calculates
+    if (dm.normals is not None):
+        mesh.normals_split_custom_set_from_vertices(dm.normals)
+
+    # Apply matrix transformation to single-binding meshes
+    singlebone = ge.singleBindName
+    if (singlebone != "") and singlebone in BoneIDArray:
+        obj['singlebind'] = singlebone
+        obj.matrix_world = BoneTrsArray[singlebone]
+
+    return True
+
+# Reads the mesh file and puts every decoded polygon group on the queue, in file order, as ("mesh", (group, decoded mesh))
+# Stops early once stop is set
+# Decoded polygon groups are only kept in memory with cache_meshes, as that keeps every group of the model alive instead of only the queued ones
+def readMeshes(Decoded, stop, MSHName, use_vertex_colors, use_uv_maps, use_custom_normals, allow_black, decode_threads, cache_meshes):
+    # Which polygon groups are decoded, and how, depends on the model file and the import options as well
+    options = (tuple(MODLGrp_array), use_vertex_colors, use_uv_maps, use_custom_normals, allow_black)
+    found, Meshes = ParsedFiles.get(MSHName, options) if cache_meshes else (False, None)
+    if found:
+        for item in Meshes:
+            if stop.is_set():
+                break
+            putDecoded(Decoded, stop, ("mesh", item))
+        print("Reused " + str(len(Meshes)) + " decoded polygon groups of " + os.path.basename(MSHName))
+        return
+
+    # Decoded groups are also kept for the cache, until they no longer fit in its budget
+    Cached = [] if cache_meshes else None
+    cached_size = 0
+
+    # Polygon groups kept on disk are loaded one at a time, the same way as they were written
+    # Groups that have been loaded are already on their way to being built, so they're skipped if the rest of the entry can't be read
+    loaded = 0
+    entry = DecodedFiles.open(MSHName, "readMeshes", options)
+    if entry is not None:
+        load_start = time.time()
+        wait_time = 0.0
+        complete = False
+        with entry:
+            try:
+                while not stop.is_set():
+                    item = loadValue(entry)
+                    if Cached is not None:
+                        cached_size += item[1].nbytes()
+                        Cached.append(item)
+                        if (cached_size > ParsedFiles.budget):
+                            Cached = None
+                    wait_time += putDecoded(Decoded, stop, ("mesh", item))
+                    loaded += 1
+            except EOFError:
+                complete = True
+            except LOAD_ERRORS:
+                # Entries that can't be read, such as ones written before the decoded data changed, are decoded again
+                print("Decoded polygon groups of " + os.path.basename(MSHName) + " could not be loaded after " + str(loaded) + " groups, decoding the rest again")
+        if complete or stop.is_set():
+            if complete:
+                DecodedFiles.record(True)
+            print("Loaded decoded polygon groups of " + os.path.basename(MSHName) + " in " + str(round(time.time() - load_start - wait_time, 4)) + " seconds")
+            if (Cached is not None and complete):
+                ParsedFiles.put(MSHName, options, Cached, cached_size)
+            return
+        DecodedFiles.record(False)
+        DecodedFiles.drop(MSHName, "readMeshes", options)
+
+    with SSBHReader(MSHName) as f:
+        meshInfo = readMeshInfo(f)
+        if meshInfo is not None:
+            # Groups that aren't listed in the model file have no material, and are skipped
+            DecodeGroups = [ge for ge in meshInfo[0] if ge.visGroupName in MODLGrp_array][loaded:]
+
+            decode_start = time.time()
+            wait_time = 0.0
+            # An entry can only be written once every group is decoded in this pass
+            writer = DecodedFiles.create(MSHName, "readMeshes", options) if loaded == 0 else None
+            Meshes = decodeMeshes(f, meshInfo, DecodeGroups, use_vertex_colors, use_uv_maps, use_custom_normals, allow_black, decode_threads)
+            complete = False
+            try:
+                for item in Meshes:
+                    if stop.is_set():
+                        break
+                    if Cached is not None:
+                        cached_size += item[1].nbytes()
+                        Cached.append(item)
+                        if (cached_size > ParsedFiles.budget):
+                            Cached = None
+                    if writer is not None:
+                        writer.dump(item)
+                    wait_time += putDecoded(Decoded, stop, ("mesh", item))
+                complete = not stop.is_set()
+            finally:
+                # The decoding threads must be done with the file before it's closed
+                Meshes.close()
+                # Only meshes that were decoded completely are kept
+                if writer is not None:
+                    if complete:
+                        writer.commit()
                     else:
-                        print(PolyGrp_array[p].visGroupName + " has no influences! Treating as a root singlebind instead.")
-                        Weight_array = []
-                        for b in range(len(Vert_array)):
-                            Weight_array.append(WeightData([1], [1.0]))
-
-                    # print(Weight_array)
-
-                # Finally edit the mesh
-                bm = bmesh.new()
-                bm.from_mesh(mesh)
-
-                weight_layer = bm.verts.layers.deform.new()
-
-                for vertIndex, vert in enumerate(Vert_array):
-                    bmv = bm.verts.new(vert)
-                    bmv.normal = Normal_array[vertIndex]
-
-                    for j in range(len(Weight_array[vertIndex].boneIDs)):
-                        bmv[weight_layer][Weight_array[vertIndex].boneIDs[j]] =  Weight_array[vertIndex].weights[j]
-
-                # Required after adding / removing vertices and before accessing them by index.
-                bm.verts.ensure_lookup_table()
-                # Required to actually retrieve the indices later on (or they stay -1).
-                bm.verts.index_update()
-
-                if (use_vertex_colors and ColorCount > 0):
-                    colorLayers = []
-                    alphaLayers = []
-                    for c in range(len(Color_array)):
-                        colorLayers.append(bm.loops.layers.color.new())
-                        alphaLayers.append(bm.loops.layers.float.new())
-
-                if (use_uv_maps and UVCount > 0):
-                    uvLayers = []
-                    for u in range(len(UV_array)):
-                        uvLayers.append(bm.loops.layers.uv.new())
-
-                for face in range(len(Face_array)):
-                    p0 = Face_array[face][0] - 1
-                    p1 = Face_array[face][1] - 1
-                    p2 = Face_array[face][2] - 1
-                    try:
-                        bmf = bm.faces.new([bm.verts[p0], bm.verts[p1], bm.verts[p2]])
-                    except:
-                        # Face already exists
-                        continue
-
-                for surface in bm.faces:
-                    for loop in surface.loops:
-                        if (use_vertex_colors and ColorCount > 0):
-                            for c in range(ColorCount):
-                                if (Color_array[c][loop.vert.index] == [0.0, 0.0, 0.0] and not allow_black):
-                                    loop[colorLayers[c]] = [1.0, 1.0, 1.0, 1.0]
-                                else:
-                                    loop[colorLayers[c]] = Color_array[c][loop.vert.index] + [Alpha_array[c][loop.vert.index]]
-
-                        if (use_uv_maps and UVCount > 0):
-                            for u in range(UVCount):
-                                loop[uvLayers[u]].uv = UV_array[u][loop.vert.index]
-
-                bm.to_mesh(mesh)
-                bm.free()
-                context.view_layer.active_layer_collection.collection.objects.link(obj)
-
-                # Try to assign materials here, and enable smooth shading per mesh
-                for poly in mesh.polygons:
-                    poly.use_smooth = True
-
-                    try:
-                        material = bpy.data.materials[MODLGrp_array[PolyGrp_array[p].visGroupName]]
-                        if material not in mesh.materials:
-                            mesh.materials.append(material)
-                        poly.material_index = mesh.materials.find(material.name)
-                    except:
-                        # Image does not exist
-                        continue
-
-                # Apply matrix transformation to single-binding meshes
-                singlebone = PolyGrp_array[p].singleBindName
-                if (singlebone != "") and singlebone in bpy.data.armatures[armaName].bones:
-                    obj['singlebind'] = singlebone
-                    obj.matrix_world = BoneTrsArray[singlebone]
-
-                bpy.ops.object.select_all(action='DESELECT')
-                obj.select_set(True)
-                context.view_layer.objects.active = obj
-                bpy.ops.object.shade_smooth()
-                obj.data.update()
+                        writer.discard()
+            print("Decoded " + str(len(DecodeGroups)) + " polygon groups in " + str(round(time.time() - decode_start - wait_time, 4)) + " seconds with " + str(decode_threads) + " threads")
+            if (Cached is not None and complete):
+                ParsedFiles.put(MSHName, options, Cached, cached_size)
+
+            f.printStats()
+
+# Puts an item on the queue, waiting while it's full unless the import has been stopped
+# Returns the time spent waiting, so that it isn't counted as decoding time
+def putDecoded(Decoded, stop, item):
+    wait_start = time.time()
+    while not stop.is_set():
+        try:
+            Decoded.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            pass
+    return time.time() - wait_start
+
+# Reads the material, skeleton and mesh files on a background thread, putting each part on the queue as soon as it's ready
+# Always ends with ("done", None), after ("error", exception) if reading failed
+def decodeModel(Decoded, stop, MATName, SKTName, MSHName, use_vertex_colors, use_uv_maps, use_custom_normals, allow_black, decode_threads, cache_meshes):
+    try:
+        if os.path.isfile(MATName):
+            putDecoded(Decoded, stop, ("materials", ParsedFiles.read(readMaterials, MATName)))
+        if os.path.isfile(SKTName):
+            skeleton = ParsedFiles.read(readSkeleton, SKTName)
+            if skeleton is not None:
+                putDecoded(Decoded, stop, ("skeleton", skeleton))
+        if os.path.isfile(MSHName):
+            readMeshes(Decoded, stop, MSHName, use_vertex_colors, use_uv_maps, use_custom_normals, allow_black, decode_threads, cache_meshes)
+    except Exception as e:
+        putDecoded(Decoded, stop, ("error", e))
+    putDecoded(Decoded, stop, ("done", None))
 
 # ==== Import OPERATOR ====
 from bpy_extras.io_utils import (ImportHelper)
@@ -956,6 +962,12 @@ class NUMDLB_Import_Operator(bpy.types.Operator, ImportHelper):
             default=True,
             )
 
+    use_custom_normals: bpy.props.BoolProperty(
+            name="Custom Normals",
+            description="Import the normals stored in meshes as custom split normals, instead of letting Blender calculate them",
+            default=True,
+            )
+
     allow_black: bpy.props.BoolProperty(
             name="Black Vertex Colors",
             description="Allow black vertex coloring",
@@ -974,11 +986,65 @@ class NUMDLB_Import_Operator(bpy.types.Operator, ImportHelper):
             default=True,
             )
 
+    decode_threads: bpy.props.IntProperty(
+            name="Decode Threads",
+            description="Number of threads used to decode polygon groups before their meshes are built",
+            default=4,
+            min=1,
+            max=64,
+            )
+
+    cache_size: bpy.props.IntProperty(
+            name="Parse Cache Size (MB)",
+            description="Memory kept for parsed files between imports, so that importing the same files again skips parsing them; 0 disables this",
+            default=512,
+            min=0,
+            )
+
+    cache_meshes: bpy.props.BoolProperty(
+            name="Keep Decoded Meshes in Memory",
+            description="Also keep decoded meshes in the parse cache, so that importing the same model again skips decoding them. Every mesh of the model is then held in memory during the import and afterwards, instead of only the few waiting to be built",
+            default=False,
+            )
+
+    cache_dir: bpy.props.StringProperty(
+            name="Decode Cache Directory",
+            description="Directory where decoded files are kept between Blender sessions, so that importing the same files again skips decoding them; leave empty to disable this",
+            default="",
+            subtype='DIR_PATH',
+            )
+
+    cache_dir_size: bpy.props.IntProperty(
+            name="Decode Cache Size (MB)",
+            description="Size that the decode cache directory is kept under, by removing the files that were used least recently",
+            default=4096,
+            min=1,
+            )
+
+    reuse_textures: bpy.props.BoolProperty(
+            name="Reuse Loaded Textures",
+            description="Reuse textures loaded by earlier imports in this session, instead of reloading them from disk once per import",
+            default=False,
+            )
+
+    decode_textures: bpy.props.BoolProperty(
+            name="Decode Textures in Background",
+            description="Decode textures on the decode threads with Pillow, if it has been installed, while materials are created. The images are packed into the .blend file, as they aren't loaded from their files",
+            default=False,
+            )
+
+    texture_dirs: bpy.props.StringProperty(
+            name="Extra Texture Directories",
+            description="Other directories to look for textures in, such as a shared textures folder, separated by semicolons. Textures next to the model are used first",
+            default="",
+            )
+
     texture_ext: bpy.props.EnumProperty(
             name="Texture File Extension",
-            description="The file type to be associated with the texture names",
+            description="The file type to be associated with the texture names. Textures that aren't found in this file type are looked for in the other supported file types",
             items=((".bmp", "BMP", "Windows Bitmap"),
                    (".cin", "CIN", "Cineon"),
+                   (".dds", "DDS", "DirectDraw Surface"),
                    (".dpx", "DPX", "Digital Moving Picture Exchange"),
                    (".exr", "EXR", "OpenEXR"),
                    (".hdr", "HDR", "High Dynamic Range"),
@@ -998,7 +1064,6 @@ class NUMDLB_Import_Operator(bpy.types.Operator, ImportHelper):
         keywords = self.as_keywords(ignore=("filter_glob",))
         time_start = time.time()
         getModelInfo(context, **keywords)
-        context.view_layer.update()
 
         print("Done! Model import completed in " + str(round(time.time() - time_start, 4)) + " seconds.")
         return {"FINISHED"}
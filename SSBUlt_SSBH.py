@@ -0,0 +1,1453 @@
+# Reading and parsing functions shared by the model and animation importers, along with the scripts in extras
+# Nothing in here may depend on Blender, so that it can also be used outside of it; everything is returned as plain data
+import collections, enum, hashlib, io, json, math, mmap, os, struct, sys, threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Whether the contents of every table are printed while files are read; the scripts in extras set this from their own setting
+print_debug_info = True
+
+# Precompiled decoders for the primitive types found in SSBH files
+U8 = struct.Struct('<B')
+U16 = struct.Struct('<H')
+U32 = struct.Struct('<L')
+F32 = struct.Struct('<f')
+MATRIX4X4 = struct.Struct('<16f')
+VEC2_F16 = struct.Struct('<2e')
+VEC4_U8 = struct.Struct('<4B')
+
+# Describes a fixed-size record of an SSBH table once, so that it can be decoded with a single unpack_from
+# Fields are listed as (name, format) pairs, with None as the name of padding and of unknown data that is skipped
+# The format 'R' marks an offset relative to the position of the field itself, which takes 8 bytes and is resolved to an absolute offset
+class SSBHRecord:
+    __slots__ = ("fields", "struct", "size", "relFields")
+
+    def __init__(self, fields):
+        self.fields = []
+        self.relFields = [] # (index of the value, position of the field within the record)
+        fmt = '<'
+        for name, fieldFmt in fields:
+            if (fieldFmt == 'R'):
+                self.relFields.append((len(self.fields), struct.calcsize(fmt)))
+                fieldFmt = 'L4x'
+            if (name is not None):
+                self.fields.append(name)
+            fmt += fieldFmt
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+        if (len(self.struct.unpack(bytes(self.size))) != len(self.fields)):
+            raise ValueError("Every named field of a record must decode to exactly one value")
+
+    # base is the position of the record within the file, for when the buffer only holds the record itself
+    def unpack(self, buffer, offset, base=None):
+        values = self.struct.unpack_from(buffer, offset)
+        if self.relFields:
+            if (base is None):
+                base = offset
+            values = list(values)
+            for index, position in self.relFields:
+                values[index] += base + position
+        return values
+
+# Layouts of the records found in the tables of model, material, skeleton and mesh files
+MODL_ENTRY = SSBHRecord([("meshGroupName", 'R'), ("unknownName", 'R'), ("materialName", 'R')])
+MATL_ENTRY = SSBHRecord([("materialName", 'R'), ("paramGroup", 'R'), ("paramCount", 'L4x'), ("shaderName", 'R')])
+MATL_PARAM = SSBHRecord([("paramID", 'L4x'), ("paramData", 'R'), ("paramType", 'L4x')])
+SKEL_BONE = SSBHRecord([("boneName", 'R'), ("boneID", 'H'), ("parentID", 'H'), ("unknown", 'L')])
+MESH_POLYGON_GROUP = SSBHRecord([
+    ("visGroupName", 'R'), (None, '4x'), ("unk1", 'L'), ("singleBindName", 'R'),
+    ("verticeCount", 'L'), ("facepointCount", 'L'), ("unk2", 'L'), ("verticeStart", 'L'), ("UVStart", 'L'),
+    ("unkOffset1", 'L'), ("unk3", 'L'), ("verticeStride", 'L'), ("UVStride", 'L'), ("unk4", 'L'), ("unk5", 'L'),
+    ("facepointStart", 'L'), ("unk6", 'L'), ("faceLongBit", 'L'), ("unk8", 'L'), ("sortPriority", 'L'), ("unk9", 'L'),
+    (None, '100x'), # 0x5C - 0xC0: A bunch of unknown float values
+    ("bufferParamStart", 'R'), ("bufferParamCount", 'L'), ("unk10", 'L')])
+MESH_BUFFERS = SSBHRecord([("vertexStart", 'R'), ("vertexSize", 'L4x'), ("UVStart", 'R'), ("UVSize", 'L4x')])
+MESH_BUFFER_PARAM = SSBHRecord([
+    ("type", 'L'), ("format", 'L'), ("set", 'L'), ("offset", 'L'), ("layer", 'L'), ("unk1", 'L'),
+    ("name1", 'R'), ("name2", 'R'), ("unk2", 'L'), ("unk3", 'L')])
+MESH_WEIGHT_GROUP = SSBHRecord([
+    ("groupName", 'R'), ("subGroupNum", 'L4x'), ("weightInfMax", 'B'), ("weightFlag2", 'B'), ("weightFlag3", 'B'), ("weightFlag4", 'B'),
+    (None, '4x'), ("rigInfOffset", 'R'), ("rigInfCount", 'L4x')])
+MESH_RIG_INFLUENCE = SSBHRecord([("boneName", 'R'), ("buffer", 'R'), ("bufferSize", 'L4x')])
+
+# Layouts of the records found in animation files
+ANIM_HEADER = SSBHRecord([
+    ("versionA", 'H'), ("versionB", 'H'), ("frameCount", 'f'), ("unk1", 'H'), ("unk2", 'H'),
+    ("animName", 'R'), ("groups", 'R'), ("groupCount", 'L4x'), ("buffer", 'R'), ("bufferSize", 'L4x')])
+ANIM_GROUP = SSBHRecord([("animType", 'L4x'), ("nodes", 'R'), ("nodeCount", 'L4x')])
+ANIM_NODE = SSBHRecord([("nodeName", 'R'), ("nodeData", 'R'), ("trackCount", 'L4x')])
+ANIM_TRACK = SSBHRecord([("typeName", 'R'), ("flags", 'L'), ("frameCount", 'L'), ("unk3", 'L'), ("dataOffset", 'L'), ("dataSize", 'L4x')])
+ANIM_COMPRESSED_HEADER = SSBHRecord([
+    ("unk4", 'H'), ("flags", 'H'), ("defaultDataOffset", 'H'), ("bitsPerEntry", 'H'), ("compressedDataOffset", 'L'), ("frameCount", 'L')])
+ANIM_COMPRESSED_ITEM = SSBHRecord([("start", 'f'), ("end", 'f'), ("count", 'L4x')])
+
+# Reads a null-terminated string from anything that supports find() (bytes, bytearray, mmap), returning the string and the position of its terminator
+# The terminator is found with one search instead of reading one byte at a time, and every name is interned,
+# so that names repeated across a file (such as Position0, Normal0 and map1 in every polygon group) are only stored once
+def readString(buffer, offset):
+    end = buffer.find(b'\x00', offset)
+    if (end < 0):
+        end = len(buffer)
+    return sys.intern(str(buffer[offset:end], "utf-8", "ignore")), end
+
+# Same as SSBHRecord.unpack(), for reading from a file object; the file is left positioned right after the record
+def readRecord(file, record):
+    offset = file.tell()
+    return record.unpack(file.read(record.size), 0, offset)
+
+# Same as readString(), for reading from a file object; the file is left positioned right after the terminator
+def readVarLenString(file):
+    start = file.tell()
+    nameBuffer = file.read(0x40)
+    end = nameBuffer.find(b'\x00')
+    while (end < 0):
+        chunk = file.read(0x100)
+        if not chunk:
+            end = len(nameBuffer)
+            break
+        end = chunk.find(b'\x00')
+        if (end >= 0):
+            end += len(nameBuffer)
+        nameBuffer += chunk
+    file.seek(start + end + 1, 0)
+    return sys.intern(str(nameBuffer[:end], "utf-8", "ignore"))
+
+# Maps a whole file into memory once, so that every header, offset table and buffer is decoded directly from the same view
+# Every access is counted, so that the amount of I/O needed to import a file can be measured
+class SSBHReader:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.file = open(filepath, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.bytesRead = 0
+        self.readCount = 0
+        self.seekCount = 0 # Number of accesses that a sequential file reader would have needed to seek for
+        self.position = 0
+        self.strings = {} # Structure of this dict is: {offset: string}
+        self.lock = threading.Lock() # Decoding can happen on several threads at once
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def count(self, offset, size):
+        with self.lock:
+            if (offset != self.position):
+                self.seekCount += 1
+            self.position = offset + size
+            self.bytesRead += size
+            self.readCount += 1
+
+    def unpack(self, fmt, offset):
+        self.count(offset, fmt.size)
+        return fmt.unpack_from(self.view, offset)
+
+    def u8(self, offset):
+        return self.unpack(U8, offset)[0]
+
+    def u16(self, offset):
+        return self.unpack(U16, offset)[0]
+
+    def u32(self, offset):
+        return self.unpack(U32, offset)[0]
+
+    def f32(self, offset):
+        return self.unpack(F32, offset)[0]
+
+    def record(self, record, offset):
+        self.count(offset, record.size)
+        return record.unpack(self.view, offset)
+
+    # The returned array is a view into the file, so it must not outlive the reader; use astype() or copy() to keep the data
+    def array(self, dtype, offset, count):
+        dtype = np.dtype(dtype)
+        self.count(offset, dtype.itemsize * count)
+        return np.frombuffer(self.view, dtype, count, offset)
+
+    # SSBH offsets are relative to the position of the offset itself
+    def relOffset(self, offset):
+        return offset + self.u32(offset)
+
+    # Strings are cached by their offset, as the same names are referenced from many records
+    def string(self, offset):
+        name = self.strings.get(offset)
+        if name is None:
+            name, end = readString(self.map, offset)
+            self.count(offset, end - offset + 1)
+            self.strings[offset] = name
+        return name
+
+    def printStats(self):
+        print(os.path.basename(self.filepath) + ": " + str(self.bytesRead) + " of " + str(len(self.map)) + " bytes read in " + str(self.readCount) + " accesses, " + str(self.seekCount) + " of which would have needed a seek")
+
+# Number of items of a list that its size is estimated from; the rest are assumed to be about as large
+SIZE_SAMPLE_COUNT = 8
+
+# Estimates how much memory a parsed value takes up, including everything it refers to
+# Lists are estimated from a few evenly spaced items, as the frames, bones and polygon groups in them are much alike
+def estimateSize(value):
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (value.nbytes if value.base is not None else 0)
+    if hasattr(value, "nbytes") and callable(value.nbytes):
+        return value.nbytes()
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool, enum.Enum)) or value is None:
+        return size
+    if isinstance(value, list):
+        if value:
+            step = max(1, len(value) // SIZE_SAMPLE_COUNT)
+            sample = value[::step][:SIZE_SAMPLE_COUNT]
+            size += sum(estimateSize(item) for item in sample) * len(value) // len(sample)
+    elif isinstance(value, (tuple, set, frozenset)):
+        size += sum(estimateSize(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimateSize(key) + estimateSize(item) for key, item in value.items())
+    elif hasattr(value, "__slots__"):
+        size += sum(estimateSize(getattr(value, name, None)) for name in value.__slots__)
+    elif hasattr(value, "__dict__"):
+        size += estimateSize(value.__dict__)
+    return size
+
+# Keeps parsed files in memory between imports, so that importing the same files again (or several models sharing a skeleton or materials) skips parsing them
+# Entries are keyed by absolute path and the options they were parsed with, and are only used while the size and modification time of the file are unchanged
+# Files that aren't in memory are looked up in DecodedFiles next, which keeps them on disk if it has been given a directory
+# The least recently used entries are dropped once the total size of all entries is over the budget, in bytes
+class ParsedFileCache:
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = collections.OrderedDict() # Structure of this dict is: {(path, options): (size, modification time, value, bytes used)}
+        self.lock = threading.Lock() # Files can be parsed on the decoding thread while meshes are built
+
+    def key(self, filepath, options):
+        return (os.path.abspath(filepath), options)
+
+    def stat(self, filepath):
+        st = os.stat(filepath)
+        return st.st_size, st.st_mtime_ns
+
+    # Returns (True, value) if the file has been parsed with these options and hasn't changed since, or (False, None) otherwise
+    def get(self, filepath, options=()):
+        key = self.key(filepath, options)
+        size, mtime = self.stat(filepath)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == size and entry[1] == mtime:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[2]
+            if entry is not None:
+                # The file has changed since it was parsed
+                del self.entries[key]
+                self.used -= entry[3]
+            self.misses += 1
+            return False, None
+
+    # nbytes is roughly how much memory the value takes up; values that don't fit in the budget at all aren't kept
+    def put(self, filepath, options, value, nbytes):
+        key = self.key(filepath, options)
+        size, mtime = self.stat(filepath)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.used -= old[3]
+            if (nbytes > self.budget):
+                return
+            self.entries[key] = (size, mtime, value, nbytes)
+            self.used += nbytes
+            self.evict()
+
+    # Parses a file with reader(filepath, *options), unless it has already been parsed
+    # With persist disabled, the file is only kept in memory and never written to DecodedFiles
+    def read(self, reader, filepath, *options, persist=True):
+        found, value = self.get(filepath, options)
+        if not found:
+            if persist:
+                found, value = DecodedFiles.get(filepath, reader.__name__, options)
+            if not found:
+                value = reader(filepath, *options)
+                if persist:
+                    DecodedFiles.put(filepath, reader.__name__, options, value)
+            self.put(filepath, options, value, estimateSize(value))
+        return value
+
+    def setBudget(self, budget):
+        with self.lock:
+            self.budget = budget
+            self.evict()
+
+    def evict(self):
+        while (self.used > self.budget and self.entries):
+            key, entry = self.entries.popitem(last=False)
+            self.used -= entry[3]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+
+    def printStats(self):
+        print("Parsed file cache: " + str(self.hits) + " hits, " + str(self.misses) + " misses, " + str(len(self.entries)) + " files kept in " + str(round(self.used / 1048576, 1)) + " of " + str(round(self.budget / 1048576, 1)) + " MB")
+
+# Shared by both importers for as long as Blender is running
+ParsedFiles = ParsedFileCache(512 * 1048576)
+
+# Changing how any file is decoded must increase this, so that entries written by older versions are no longer used
+DECODE_CACHE_VERSION = 3
+
+# Classes that values kept in the decode cache may hold; no other class is ever created when an entry is read
+# Structure of this dict is: {class name: class}
+CacheableClasses = {}
+
+# Class decorator that allows the class to be kept in the decode cache; every such class has __slots__ and can be created without arguments
+def cacheable(cls):
+    CacheableClasses[cls.__name__] = cls
+    return cls
+
+# Turns a value into something that can be written as JSON, with its arrays moved into the given list
+# Entries are never pickled, as the directory may be shared, and loading a pickle can run any code placed in it
+def packValue(value, arrays):
+    if isinstance(value, np.ndarray):
+        arrays.append(value)
+        return {"array": len(arrays) - 1}
+    if isinstance(value, np.generic):
+        return value.item()
+    if (value is None or isinstance(value, (bool, int, float, str))):
+        return value
+    if isinstance(value, list):
+        return [packValue(item, arrays) for item in value]
+    if isinstance(value, tuple):
+        return {"tuple": [packValue(item, arrays) for item in value]}
+    if isinstance(value, dict):
+        return {"dict": [[packValue(key, arrays), packValue(item, arrays)] for key, item in value.items()]}
+    cls = type(value)
+    if (CacheableClasses.get(cls.__name__) is cls):
+        return {"class": cls.__name__, "fields": {name: packValue(getattr(value, name), arrays) for name in cls.__slots__}}
+    raise TypeError(cls.__name__ + " can't be kept in the decode cache")
+
+def unpackValue(packed, arrays):
+    if isinstance(packed, list):
+        return [unpackValue(item, arrays) for item in packed]
+    if isinstance(packed, dict):
+        if "array" in packed:
+            return arrays[packed["array"]]
+        if "tuple" in packed:
+            return tuple(unpackValue(item, arrays) for item in packed["tuple"])
+        if "dict" in packed:
+            return {unpackValue(key, arrays): unpackValue(item, arrays) for key, item in packed["dict"]}
+        value = CacheableClasses[packed["class"]]()
+        for name, field in packed["fields"].items():
+            setattr(value, name, unpackValue(field, arrays))
+        return value
+    return packed
+
+# Writes one value to a decode cache entry, as its length, the value as JSON, and then every array in it in the .npy format
+def dumpValue(file, value):
+    arrays = []
+    header = json.dumps({"value": packValue(value, arrays), "arrays": len(arrays)}).encode("utf-8")
+    file.write(U32.pack(len(header)))
+    file.write(header)
+    for array in arrays:
+        np.lib.format.write_array(file, np.ascontiguousarray(array), allow_pickle=False)
+
+# Errors that reading a damaged, cut off or outdated entry can raise: failed reads, invalid lengths, JSON or arrays, and classes, fields or arrays that don't exist
+LOAD_ERRORS = (OSError, EOFError, ValueError, KeyError, IndexError, TypeError, AttributeError, struct.error)
+
+# Reads the next value written by dumpValue(), raising EOFError once there are no more
+def loadValue(file):
+    size = file.read(U32.size)
+    if not size:
+        raise EOFError
+    header = json.loads(file.read(U32.unpack(size)[0]).decode("utf-8"))
+    arrays = [np.lib.format.read_array(file, allow_pickle=False) for a in range(header["arrays"])]
+    return unpackValue(header["value"], arrays)
+
+# Share of the size limit that the decode cache is brought down to once it's over the limit, so that the directory isn't listed again for every entry written after that
+TRIM_TARGET = 0.75
+
+# Keeps decoded files on disk between Blender sessions, in a directory chosen by the user; nothing is kept while the directory is empty
+# Entries are named after a hash of the contents of the file, so that they stop matching as soon as the file changes, and hold one or more values written by dumpValue()
+# Once the directory is over its size limit, in bytes, the entries that were least recently used are removed
+# The total size of the entries is counted as they are written and removed, so the directory is only listed when it's configured and once it's over the limit
+class DiskCache:
+    def __init__(self):
+        self.directory = ""
+        self.limit = 0
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+        self.hashes = {} # Structure of this dict is: {(path, size, modification time): hash of the contents}
+        self.lock = threading.Lock()
+
+    def configure(self, directory, limit):
+        self.directory = directory
+        self.limit = limit
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.trim()
+
+    # Files are only hashed again once their size or modification time changes
+    def hashFile(self, filepath):
+        st = os.stat(filepath)
+        key = (os.path.abspath(filepath), st.st_size, st.st_mtime_ns)
+        digest = self.hashes.get(key)
+        if digest is None:
+            contents = hashlib.blake2b(digest_size=20)
+            with open(filepath, 'rb') as file:
+                for chunk in iter(lambda: file.read(1048576), b''):
+                    contents.update(chunk)
+            digest = contents.hexdigest()
+            with self.lock:
+                self.hashes[key] = digest
+        return digest
+
+    def path(self, filepath, name, options):
+        optionsHash = hashlib.blake2b(repr((DECODE_CACHE_VERSION, options)).encode("utf-8"), digest_size=8).hexdigest()
+        return os.path.join(self.directory, self.hashFile(filepath) + "-" + name + "-" + optionsHash + ".ssbhcache")
+
+    # Returns the entry opened for reading, so that its values can be loaded one at a time with loadValue(), or None if there is none
+    # Once the entry has been read, record() must be called with whether that succeeded
+    def open(self, filepath, name, options):
+        if not self.directory:
+            return None
+        path = self.path(filepath, name, options)
+        try:
+            entry = open(path, 'rb')
+        except OSError:
+            self.record(False)
+            return None
+        try:
+            os.utime(path) # Marks the entry as recently used
+        except OSError:
+            pass # Entries in a directory that can't be written to are still read
+        return entry
+
+    # Counts an entry that has been read completely as a hit, and one that couldn't be read as a miss
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    # Removes an entry that couldn't be read, so that it's replaced once its file has been decoded again
+    def drop(self, filepath, name, options):
+        path = self.path(filepath, name, options)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self.lock:
+            self.used -= size
+
+    # Returns a writer to dump() values into, which only becomes an entry once it's committed, or None if nothing is kept
+    def create(self, filepath, name, options):
+        if not self.directory:
+            return None
+        return DiskCacheWriter(self, self.path(filepath, name, options))
+
+    # Returns (True, value) if the file has been decoded with these options before, or (False, None) otherwise
+    def get(self, filepath, name, options):
+        entry = self.open(filepath, name, options)
+        if entry is None:
+            return False, None
+        try:
+            with entry:
+                value = loadValue(entry)
+        except LOAD_ERRORS:
+            # Entries that can't be read are decoded again and replaced; they're only removed once closed, as Windows can't remove open files
+            self.record(False)
+            self.drop(filepath, name, options)
+            return False, None
+        self.record(True)
+        return True, value
+
+    def put(self, filepath, name, options, value):
+        writer = self.create(filepath, name, options)
+        if writer is not None:
+            try:
+                writer.dump(value)
+            except BaseException:
+                writer.discard()
+                raise
+            writer.commit()
+
+    # Counts the size of all entries again, and removes the least recently used ones if that is over the limit
+    def trim(self):
+        with self.lock:
+            entries = []
+            for entryName in os.listdir(self.directory):
+                if entryName.endswith(".ssbhcache"):
+                    try:
+                        st = os.stat(os.path.join(self.directory, entryName))
+                    except OSError:
+                        continue # Removed in the meantime, such as by another Blender using the same directory
+                    entries.append((st.st_mtime, st.st_size, entryName))
+            entries.sort()
+            self.used = sum(entry[1] for entry in entries)
+            if (self.used <= self.limit):
+                return
+            for mtime, size, entryName in entries:
+                if (self.used <= self.limit * TRIM_TARGET):
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, entryName))
+                    self.used -= size
+                except OSError:
+                    pass
+
+    def printStats(self):
+        if self.directory:
+            print("Decode cache: " + str(self.hits) + " hits, " + str(self.misses) + " misses, " + str(self.written) + " entries written to " + self.directory)
+
+# Values are written to a temporary file first, so that an import that is stopped or fails halfway never leaves an incomplete entry behind
+class DiskCacheWriter:
+    def __init__(self, cache, path):
+        self.cache = cache
+        self.path = path
+        self.tempPath = path + "." + str(os.getpid()) + "-" + str(threading.get_ident()) + ".tmp"
+        self.file = open(self.tempPath, 'wb')
+
+    def dump(self, value):
+        dumpValue(self.file, value)
+
+    def commit(self):
+        size = self.file.tell()
+        self.file.close()
+        try:
+            replaced = os.path.getsize(self.path)
+        except OSError:
+            replaced = 0
+        os.replace(self.tempPath, self.path)
+        with self.cache.lock:
+            self.cache.written += 1
+            self.cache.used += size - replaced
+            over = (self.cache.used > self.cache.limit)
+        if over:
+            self.cache.trim()
+
+    def discard(self):
+        self.file.close()
+        os.remove(self.tempPath)
+
+# Shared by both importers; only used once an importer has been given a directory
+DecodedFiles = DiskCache()
+
+# ==== Model files ====
+# Data types of vertex attributes: {format: (NumPy type, component count)}
+ATTRIBUTE_FORMATS = {0: ('<f4', 3), 2: ('u1', 4), 4: ('<f4', 4), 5: ('<f2', 4), 7: ('<f4', 2), 8: ('<f2', 2)}
+# Formats assumed for each kind of attribute when its format is unknown; these were the only ones supported before
+DEFAULT_FORMATS = {"position": 0, "normal": 5, "tangent": 5, "uv": 8, "color": 2}
+UV_NAMES = ("map1", "uvSet", "uvSet1", "uvSet2", "bake1")
+
+def getAttributeKind(name, usage):
+    if (name == "Position0"):
+        return "position"
+    elif (name == "Normal0"):
+        return "normal"
+    elif (name == "Tangent0"):
+        return "tangent"
+    elif (name in UV_NAMES or name.startswith("uvSet") or name.startswith("bake")):
+        return "uv"
+    elif (name.startswith("colorSet")):
+        return "color"
+    # Fall back to the usage of the attribute for names that aren't known
+    elif (usage == 4):
+        return "uv"
+    elif (usage == 5):
+        return "color"
+    return None
+
+# A compiled decode plan for one layout of buffer parameters, so that each vertex buffer of a polygon group is decoded with one strided read
+# dtypes has a record type for each of the two vertex buffers; the other members list the fields of each kind as (buffer set, field name)
+class VertexLayout:
+    __slots__ = ("dtypes", "position", "normal", "tangent", "uvs", "colors")
+
+    def __init__(self):
+        self.dtypes = []
+        self.position = None
+        self.normal = None
+        self.tangent = None
+        self.uvs = []
+        self.colors = []
+
+# Structure of this dict is: {(attributes, strides): VertexLayout}; polygon groups sharing a layout share the same plan
+VertexLayouts = {}
+
+# attributes is a tuple of (name, usage, format, buffer set, offset) for every buffer parameter, and strides has the stride of each vertex buffer
+def getVertexLayout(attributes, strides):
+    layout = VertexLayouts.get((attributes, strides))
+    if layout is not None:
+        return layout
+
+    layout = VertexLayout()
+    fields = [{'names': [], 'formats': [], 'offsets': []} for stride in strides]
+    for name, usage, fmt, bufferSet, offset in attributes:
+        kind = getAttributeKind(name, usage)
+        if (kind is None):
+            print("Unknown attribute " + name + ", skipping")
+            continue
+        if (bufferSet >= len(strides)):
+            print("Attribute " + name + " is in unknown buffer " + str(bufferSet) + ", skipping")
+            continue
+        if (fmt not in ATTRIBUTE_FORMATS):
+            print("Unknown format " + str(fmt) + " for " + name + ", assuming " + str(DEFAULT_FORMATS[kind]))
+            fmt = DEFAULT_FORMATS[kind]
+        buffer = fields[bufferSet]
+        if name in buffer['names']:
+            name += "." + str(len(buffer['names']))
+        buffer['names'].append(name); buffer['formats'].append(ATTRIBUTE_FORMATS[fmt]); buffer['offsets'].append(offset)
+
+        field = (bufferSet, name)
+        if (kind == "uv"):
+            layout.uvs.append(field)
+        elif (kind == "color"):
+            layout.colors.append(field)
+        elif (getattr(layout, kind) is None):
+            setattr(layout, kind, field)
+
+    for buffer, stride in zip(fields, strides):
+        end = max([offset + np.dtype(fmt).itemsize for fmt, offset in zip(buffer['formats'], buffer['offsets'])], default=0)
+        buffer['itemsize'] = max(stride, end)
+        layout.dtypes.append(np.dtype(buffer))
+
+    VertexLayouts[(attributes, strides)] = layout
+    return layout
+
+# Makes duplicate UV coordinates unique so that Blender will not remove them
+# Sorting brings equal coordinates together; as before, the n-th repeat of a coordinate is nudged n times
+def uniquifyUVs(uvmap):
+    uvs = np.array(uvmap, dtype=np.float64).reshape(-1, 2)
+    if (len(uvs) < 2):
+        return uvs
+    order = np.lexsort((uvs[:, 1], uvs[:, 0])) # Stable, so repeats stay in their original order
+    ordered = uvs[order]
+    repeat = np.zeros(len(ordered), dtype=bool)
+    repeat[1:] = np.all(ordered[1:] == ordered[:-1], axis=1)
+    positions = np.arange(len(ordered))
+    rank = positions - np.maximum.accumulate(np.where(repeat, 0, positions))
+    byRank = np.argsort(rank, kind='stable')
+    counts = np.bincount(rank)
+    start = counts[0]
+    for r in range(1, len(counts)):
+        # Every repeat is nudged from the value of the repeat before it
+        current = byRank[start:start + counts[r]]
+        ordered[current] = ordered[current - 1] + 0.000000000000001
+        start += counts[r]
+    uvs[order] = ordered
+    return uvs
+
+# Reads the triangles of a polygon group, leaving out the ones that Blender would reject
+def readFaces(f, offset, facepointCount, faceLongBit, verticeCount):
+    if (faceLongBit == 0):
+        indexType = '<u2'
+    elif (faceLongBit == 1):
+        indexType = '<u4'
+    else:
+        raise RuntimeError("Unknown face bit value!")
+    faces = f.array(indexType, offset, (facepointCount // 3) * 3).astype(np.int64).reshape(-1, 3)
+    # Faces pointing past the last vertex, or using the same vertex more than once
+    valid = np.all(faces < verticeCount, axis=1)
+    valid &= (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    faces = faces[valid]
+    # Faces using the same vertices as an earlier one, in any order, already exist
+    unused, first = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    return faces[np.sort(first)].astype(np.int32)
+
+# Rig influences are packed pairs of a vertex index and a weight
+RIG_INFLUENCE = np.dtype([("vertex", '<u2'), ("weight", '<f4')])
+
+@cacheable
+class MaterialData:
+    __slots__ = ("materialName", "color1Name", "color2Name", "bakeName", "normalName", "emissive1Name", "emissive2Name", "prmName", "envName")
+
+    def __init__(self):
+        self.materialName = ""
+        self.color1Name = ""
+        self.color2Name = ""
+        self.bakeName = ""
+        self.normalName = ""
+        self.emissive1Name = ""
+        self.emissive2Name = ""
+        self.prmName = ""
+        self.envName = ""
+
+    def __repr__(self):
+        return "Material name: " + str(self.materialName) + "\t| Color 1 name: " + str(self.color1Name) + "\t| Color 2 name: " + str(self.color2Name) + "\t| Bake name: " + str(self.bakeName) + "\t| Normal name: " + str(self.normalName) + "\t| Emissive 1 name: " + str(self.emissive1Name) + "\t| Emissive 2 name: " + str(self.emissive2Name) + "\t| PRM name: " + str(self.prmName) + "\t| Env name: " + str(self.envName) + "\n"
+
+@cacheable
+class PolygonGroupData:
+    __slots__ = ("visGroupName", "singleBindName", "facepointCount", "facepointStart", "faceLongBit", "verticeCount", "verticeStart", "verticeStride", "UVStart", "UVStride",
+                 "bufferParamStart", "bufferParamCount", "sortPriority", "unknowns")
+
+    def __init__(self):
+        self.visGroupName = ""
+        self.singleBindName = ""
+        self.facepointCount = 0
+        self.facepointStart = 0
+        self.faceLongBit = 0
+        self.verticeCount = 0
+        self.verticeStart = 0
+        self.verticeStride = 0
+        self.UVStart = 0
+        self.UVStride = 0
+        self.bufferParamStart = 0
+        self.bufferParamCount = 0
+        self.sortPriority = 0
+        self.unknowns = ()
+
+    def __repr__(self):
+        return "Vis group name: " + str(self.visGroupName) + "\t| Single bind name: " + str(self.singleBindName) + "\t| Facepoint count: " + str(self.facepointCount) + "\t| Facepoint start: " + str(self.facepointStart) + "\t| Face long bit: " + str(self.faceLongBit) + "\t| Vertice count: " + str(self.verticeCount) + "\t| Vertice start " + str(self.verticeStart) + "\t| Vertice stride: " + str(self.verticeStride) + "\t| UV start: " + str(self.UVStart) + "\t| UV stride: " + str(self.UVStride) + "\t| Buffer parameter start: " + str(self.bufferParamStart) + "\t| Buffer parameter count: " + str(self.bufferParamCount) + "\n"
+
+@cacheable
+class WeightGroupData:
+    __slots__ = ("groupName", "subGroupNum", "weightInfMax", "weightFlag2", "weightFlag3", "weightFlag4", "rigInfOffset", "rigInfCount")
+
+    def __init__(self):
+        self.groupName = ""
+        self.subGroupNum = 0
+        self.weightInfMax = 0
+        self.weightFlag2 = 0
+        self.weightFlag3 = 0
+        self.weightFlag4 = 0
+        self.rigInfOffset = 0
+        self.rigInfCount =  0
+
+    def __repr__(self):
+        return str(self.groupName) + "\t| Subgroup #: " + str(self.subGroupNum) + "\t| Weight info max: " + str(self.weightInfMax) + "\t| Weight flags: " + str(self.weightFlag2) + ", " + str(self.weightFlag3) + ", " + str(self.weightFlag4) + "\t| Rig info offset: " + str(self.rigInfOffset) + "\t| Rig info count: " + str(self.rigInfCount) + "\n"
+
+# Reads a model file, returning its name, the paths of the skeleton, material and mesh files that it references, and the material of every mesh group
+def readModel(filepath):
+    dirPath = os.path.dirname(filepath)
+    MODLGrp_array = {}
+    # Structure of this dict is: {mesh group name: material name}
+    with SSBHReader(filepath) as md:
+        # Reads the model file to find information about the other files
+        MODLCheck = md.u32(0x10)
+        if (MODLCheck == 0x4D4F444C):
+            MODLVerA = md.u16(0x14)
+            MODLVerB = md.u16(0x16)
+            MODLNameOff = md.relOffset(0x18)
+            SKTNameOff = md.relOffset(0x20)
+            MATNameOff = md.relOffset(0x28)
+            MSHNameOff = md.relOffset(0x40)
+            MSHDatOff = md.relOffset(0x48)
+            MSHDatCount = md.u32(0x50)
+            MODLName = md.string(MODLNameOff)
+            SKTName = os.path.join(dirPath, md.string(SKTNameOff))
+            MATNameStrLen = md.u32(MATNameOff)
+            MATName = os.path.join(dirPath, md.string(MATNameOff + 0x08))
+            MSHName = os.path.join(dirPath, md.string(MSHNameOff))
+            nameCounter = 0
+            for g in range(MSHDatCount):
+                MSHGrpNameOff, MSHUnkNameOff, MSHMatNameOff = md.record(MODL_ENTRY, MSHDatOff + (g * MODL_ENTRY.size))
+                meshGroupName = md.string(MSHGrpNameOff)
+                meshMaterialName = md.string(MSHMatNameOff)
+                if meshGroupName in MODLGrp_array:
+                    nameCounter += 1
+                    MODLGrp_array[meshGroupName + str(nameCounter * .001)[1:]] = meshMaterialName
+                else:
+                    MODLGrp_array[meshGroupName] = meshMaterialName
+                    nameCounter = 0
+            if print_debug_info:
+                print(MODLGrp_array)
+            md.printStats()
+        else:
+            raise RuntimeError("%s is not a valid NUMDLB file." % filepath)
+    return MODLName, SKTName, MATName, MSHName, MODLGrp_array
+
+# Reads the texture names of every material in a material file
+def readMaterials(MATName):
+    MaterialList = []
+    with SSBHReader(MATName) as mt:
+        MATCheck = mt.u32(0x10)
+        if (MATCheck == 0x4D41544C):
+            MATVerA = mt.u16(0x14)
+            MATVerB = mt.u16(0x16)
+            MATHeadOff = mt.relOffset(0x18)
+            MATCount = mt.u32(0x20)
+            for m in range(MATCount):
+                pe = MaterialData()
+                MATNameOff, MATParamGrpOff, MATParamGrpCount, MATShdrNameOff = mt.record(MATL_ENTRY, MATHeadOff + (m * MATL_ENTRY.size))
+                pe.materialName = mt.string(MATNameOff)
+                print("Textures for " + pe.materialName + ":")
+                for p in range(MATParamGrpCount):
+                    MatParamID, MatParamOff, MatParamType = mt.record(MATL_PARAM, MATParamGrpOff + (p * MATL_PARAM.size))
+                    if (MatParamType == 0x0B):
+                        TexName = str.lower(mt.string(MatParamOff + 0x08))
+                        print("(" + hex(MatParamID) + ") for " + TexName)
+                        if (MatParamID == 0x5C):
+                            pe.color1Name = TexName
+                        elif (MatParamID == 0x5D):
+                            pe.color2Name = TexName
+                        elif (MatParamID == 0x5F):
+                            pe.bakeName = TexName
+                        elif (MatParamID == 0x60):
+                            pe.normalName = TexName
+                        elif (MatParamID == 0x61):
+                            pe.emissive1Name = TexName
+                            if (pe.color1Name == ""):
+                                pe.color1Name = TexName
+                        elif (MatParamID == 0x62):
+                            pe.prmName = TexName
+                        elif (MatParamID == 0x63):
+                            pe.envName = TexName
+                        elif (MatParamID == 0x65):
+                            pe.bakeName = TexName
+                        elif (MatParamID == 0x66):
+                            pe.color1Name = TexName
+                        elif (MatParamID == 0x67):
+                            pe.color2Name = TexName
+                        elif (MatParamID == 0x6A):
+                            pe.emissive2Name = TexName
+                            if (pe.color2Name == ""):
+                                pe.color2Name = TexName
+                        elif (MatParamID == 0x133):
+                            print("noise_for_warp")
+                        else:
+                            if print_debug_info:
+                                print("Unknown type (" + hex(MatParamID) + ") for " + TexName)
+
+                print("-----")
+                MaterialList.append(pe)
+            mt.printStats()
+    return MaterialList
+
+# Reads a skeleton file, returning the names, parent indices and matrices (as 16 floats each) of every bone, or None if the file isn't a valid skeleton
+def readSkeleton(SKTName):
+    BoneCount = 0
+    BoneParent_array = []
+    BoneName_array = []
+    BoneMatrix_array = []
+
+    with SSBHReader(SKTName) as b:
+        BoneCheck = b.u32(0x10)
+        if (BoneCheck == 0x534B454C):
+            SkelVerA = b.u16(0x14)
+            SkelVerB = b.u16(0x16)
+            BoneOffset = b.relOffset(0x18)
+            BoneCount = b.u32(0x20)
+            BoneMatrOffset = b.relOffset(0x28)
+            BoneMatrCount = b.u32(0x30)
+            BoneInvMatrOffset = b.relOffset(0x38)
+            BoneInvMatrCount = b.u32(0x40)
+            BoneRelMatrOffset = b.relOffset(0x48)
+            BoneRelMatrCount = b.u32(0x50)
+            BoneRelMatrInvOffset = b.relOffset(0x58)
+            BoneRelMatrInvCount = b.u32(0x60)
+
+            for c in range(BoneCount):
+                BoneNameOffset, BoneID, BoneParent, BoneUnk = b.record(SKEL_BONE, BoneOffset + (c * SKEL_BONE.size))
+                BoneName = b.string(BoneNameOffset)
+                BoneParent_array.append(BoneParent)
+                BoneName_array.append(BoneName)
+
+            print("Total number of bones found: " + str(BoneCount))
+            if print_debug_info:
+                print(BoneParent_array)
+                print(BoneName_array)
+
+            for c in range(BoneCount):
+                BoneMatrix_array.append(b.unpack(MATRIX4X4, BoneMatrOffset + (c * 0x40)))
+            b.printStats()
+            return BoneName_array, BoneParent_array, BoneMatrix_array
+    return None
+
+# Everything needed to build the mesh of one polygon group, already in the form that is filled into Blender
+# Loop data (colors and UVs) is flattened in loop order; weights is a list of (bone name, vertex indices, weights),
+# as bones are only indexed once the armature exists, and None as the bone name stands for the root bone
+@cacheable
+class DecodedMesh:
+    __slots__ = ("vertices", "normals", "faces", "colors", "uvs", "weights", "rigged")
+
+    def __init__(self):
+        self.vertices = None
+        self.normals = None
+        self.faces = None
+        self.colors = []
+        self.uvs = []
+        self.weights = []
+        self.rigged = False
+
+    # Approximate memory used by the decoded arrays, for ParsedFileCache
+    def nbytes(self):
+        total = self.vertices.nbytes + self.faces.nbytes
+        if self.normals is not None:
+            total += self.normals.nbytes
+        for layer in self.colors + self.uvs:
+            total += layer.nbytes
+        for boneName, vertices, weights in self.weights:
+            total += vertices.nbytes + weights.nbytes
+        return total
+
+# Decodes one polygon group from the mesh file; polygon groups can be decoded on several threads at once
+def decodePolygonGroup(f, ge, VertOffStart, UVOffStart, FaceBuffOffset, WeightGrp_array, use_vertex_colors, use_uv_maps, use_custom_normals, allow_black):
+    dm = DecodedMesh()
+    Attributes = []
+    for v in range(ge.bufferParamCount):
+        # BuffParamUnk1 is always 0?, BuffParamUnk2 always 1?, BuffParamUnk3 always 0?
+        BuffParamType, BuffParamFmt, BuffParamSet, BuffParamOffset, BuffParamLayer, BuffParamUnk1, BuffParamStrOff1, BuffParamStrOff2, BuffParamUnk2, BuffParamUnk3 = \
+        f.record(MESH_BUFFER_PARAM, ge.bufferParamStart + (v * MESH_BUFFER_PARAM.size))
+        BuffNameOff = f.relOffset(BuffParamStrOff2)
+        BuffName = f.string(BuffNameOff)
+        Attributes.append((BuffName, BuffParamType, BuffParamFmt, BuffParamSet, BuffParamOffset))
+    Layout = getVertexLayout(tuple(Attributes), (ge.verticeStride, ge.UVStride))
+
+    # Read vertice data; each vertex buffer is decoded at once, as described by the layout
+    print("Total number of vertices found: " + str(ge.verticeCount))
+    VertPos = VertOffStart + ge.verticeStart
+    UVPos = UVOffStart + ge.UVStart
+    if print_debug_info:
+        print(ge.visGroupName + " Vert start: " + str(VertPos) + " | UV start: " + str(UVPos))
+    Buffers = []
+    for dtype, start in zip(Layout.dtypes, (VertPos, UVPos)):
+        # Buffers without any known attribute are skipped
+        Buffers.append(f.array(dtype, start, ge.verticeCount) if dtype.names else None)
+
+    if (Layout.position is not None):
+        dm.vertices = Buffers[Layout.position[0]][Layout.position[1]][:, :3].astype(np.float32, order='C')
+    else:
+        print("No positions found for " + ge.visGroupName + "!")
+        dm.vertices = np.zeros((ge.verticeCount, 3), dtype=np.float32)
+    # Read normals only if they will be applied
+    if (use_custom_normals and Layout.normal is not None):
+        dm.normals = Buffers[Layout.normal[0]][Layout.normal[1]][:, :3].astype(np.float32, order='C')
+
+    # Read UV map data if option is enabled
+    UV_array = []
+    if use_uv_maps:
+        for bufferSet, name in Layout.uvs:
+            UVs = Buffers[bufferSet][name][:, :2].astype(np.float64)
+            UVs[:, 1] = (UVs[:, 1] * -1) + 1
+            UV_array.append(UVs)
+
+    # Read vertex color data if option is enabled
+    Color_array = []
+    if use_vertex_colors:
+        for bufferSet, name in Layout.colors:
+            Colors = np.ones((ge.verticeCount, 4), dtype=np.float32)
+            Values = Buffers[bufferSet][name]
+            Colors[:, :Values.shape[1]] = Values[:, :4]
+            if (Values.dtype == np.uint8):
+                Colors[:, :Values.shape[1]] /= 128
+            if not allow_black:
+                Colors[np.all(Colors[:, :3] == 0.0, axis=1)] = 1.0
+            Color_array.append(Colors)
+            del Values
+    del Buffers # Release the views into the file
+
+    if print_debug_info:
+        print(ge.visGroupName + " Vert end: " + str(VertPos + (Layout.dtypes[0].itemsize * ge.verticeCount)) + " | UV end: " + str(UVPos + (Layout.dtypes[1].itemsize * ge.verticeCount)))
+    # Search for duplicate UV coordinates and make them unique so that Blender will not remove them
+    for uv in range(len(UV_array)):
+        UV_array[uv] = uniquifyUVs(UV_array[uv])
+
+    # Read face data
+    FacePos = FaceBuffOffset + ge.facepointStart
+    if print_debug_info:
+        print(ge.visGroupName + " Face start: " + str(FacePos))
+    dm.faces = readFaces(f, FacePos, ge.facepointCount, ge.faceLongBit, ge.verticeCount)
+    FacePos += (ge.faceLongBit + 1) * 2 * ge.facepointCount
+
+    if print_debug_info:
+        print(ge.visGroupName + " Face end: " + str(FacePos))
+
+    # Loop data is gathered from the per-vertex arrays by the vertex that each loop uses
+    LoopVerts = dm.faces.ravel()
+    dm.colors = [Colors[LoopVerts].ravel() for Colors in Color_array]
+    dm.uvs = [UVs[LoopVerts].astype(np.float32).ravel() for UVs in UV_array]
+
+    if (ge.singleBindName != ""):
+        dm.weights.append((ge.singleBindName, np.arange(len(dm.vertices)), np.ones(len(dm.vertices), dtype=np.float32)))
+    else:
+        RigSet = 1
+        for b in range(len(WeightGrp_array)):
+                if (ge.visGroupName == WeightGrp_array[b].groupName):
+                    RigSet = b
+                    break
+        # Read vertice/weight group data
+        if print_debug_info:
+            print(ge.visGroupName + " Rig info start: " + str(WeightGrp_array[RigSet].rigInfOffset))
+
+        if (WeightGrp_array[RigSet].rigInfCount != 0):
+            dm.rigged = True
+            for x in range(WeightGrp_array[RigSet].rigInfCount):
+                RigBoneNameOffset, RigBuffStart, RigBuffSize = f.record(MESH_RIG_INFLUENCE, WeightGrp_array[RigSet].rigInfOffset + (x * MESH_RIG_INFLUENCE.size))
+                RigBoneName = f.string(RigBoneNameOffset)
+                Influences = f.array(RIG_INFLUENCE, RigBuffStart, RigBuffSize // RIG_INFLUENCE.itemsize)
+                dm.weights.append((RigBoneName, Influences["vertex"].astype(np.int64), Influences["weight"].astype(np.float32)))
+                del Influences # Release the view into the file
+
+        else:
+            print(ge.visGroupName + " has no influences! Treating as a root singlebind instead.")
+            dm.weights.append((None, np.arange(len(dm.vertices)), np.ones(len(dm.vertices), dtype=np.float32)))
+
+    return dm
+
+# Reads the header, polygon groups and weight groups of a mesh file, which every polygon group is decoded with
+# Returns the polygon groups, weight groups and the offsets of the vertex, UV and face buffers, or None if the file isn't a valid mesh
+def readMeshInfo(f):
+    PolyGrp_array = []
+    WeightGrp_array = []
+
+    MSHCheck = f.u32(0x10)
+    if (MSHCheck == 0x4D455348):
+        MeshVerA = f.u16(0x14)
+        MeshVerB = f.u16(0x16)
+        PolyGrpInfOffset = f.relOffset(0x88)
+        PolyGrpCount = f.u32(0x90)
+        UnkOffset1 = f.relOffset(0x98)
+        UnkCount1 = f.u32(0xA0)
+        FaceBuffSizeB = f.relOffset(0xA8)
+        VertBuffOffset = f.relOffset(0xB0)
+        UnkCount2 = f.u32(0xB8)
+        FaceBuffOffset = f.relOffset(0xC0)
+        FaceBuffSize = f.relOffset(0xC8)
+        WeightBuffOffset = f.relOffset(0xD0)
+        WeightCount = f.u32(0xD8)
+
+        nameCounter = 0
+        for g in range(PolyGrpCount):
+            ge = PolygonGroupData()
+            # Unk2 is always 3?, Unk3 always 0?, Unk4 either 0 or 32, Unk5 always 0, Unk6 always 4, Unk8 either 0 or 1, Unk9 0, 1, 256 or 257, Unk10 always 0
+            VisGrpNameOffset, Unk1, SingleBindNameOffset, ge.verticeCount, ge.facepointCount, Unk2, ge.verticeStart, ge.UVStart, UnkOff1, Unk3, \
+            ge.verticeStride, ge.UVStride, Unk4, Unk5, ge.facepointStart, Unk6, ge.faceLongBit, Unk8, ge.sortPriority, Unk9, \
+            ge.bufferParamStart, ge.bufferParamCount, Unk10 = f.record(MESH_POLYGON_GROUP, PolyGrpInfOffset + (g * MESH_POLYGON_GROUP.size))
+            visGroupBuffer = f.string(VisGrpNameOffset)
+            if (len(PolyGrp_array) > 0 and (PolyGrp_array[g - 1].visGroupName == visGroupBuffer or PolyGrp_array[g - 1].visGroupName[:-4] == visGroupBuffer)):
+                nameCounter += 1
+                ge.visGroupName = visGroupBuffer + str(nameCounter * .001)[1:]
+            else:
+                ge.visGroupName = visGroupBuffer
+                nameCounter = 0
+            ge.singleBindName = f.string(SingleBindNameOffset)
+            # Kept for the scripts in extras, which print them to help find out what they are
+            ge.unknowns = (Unk1, UnkOff1, Unk2, Unk3, Unk4, Unk5, Unk6, Unk8, Unk9, Unk10)
+            PolyGrp_array.append(ge)
+
+        if print_debug_info:
+            print(PolyGrp_array)
+
+        VertOffStart, VertBuffSize, UVOffStart, UVBuffSize = f.record(MESH_BUFFERS, VertBuffOffset)
+
+        nameCounter = 0
+        for b in range(WeightCount):
+            be = WeightGroupData()
+            GrpNameOffset, be.subGroupNum, be.weightInfMax, be.weightFlag2, be.weightFlag3, be.weightFlag4, be.rigInfOffset, be.rigInfCount = \
+            f.record(MESH_WEIGHT_GROUP, WeightBuffOffset + (b * MESH_WEIGHT_GROUP.size))
+            groupNameBuffer = f.string(GrpNameOffset)
+            if (len(WeightGrp_array) > 0 and (WeightGrp_array[b - 1].groupName == groupNameBuffer or WeightGrp_array[b - 1].groupName[:-4] == groupNameBuffer)):
+                nameCounter += 1
+                be.groupName = groupNameBuffer + str(nameCounter * .001)[1:]
+            else:
+                be.groupName = groupNameBuffer
+                nameCounter = 0
+            WeightGrp_array.append(be)
+
+        if print_debug_info:
+            print(WeightGrp_array)
+        return PolyGrp_array, WeightGrp_array, VertOffStart, UVOffStart, FaceBuffOffset
+    return None
+
+# Decodes the given polygon groups of a mesh file on a thread pool, yielding (group, decoded mesh) in the same order
+# Only touches the file, and most of the work is done by NumPy, which releases the GIL
+# At most decode_threads groups are decoded ahead of the caller, so that memory stays bounded however large the mesh is
+def decodeMeshes(f, meshInfo, groups, use_vertex_colors, use_uv_maps, use_custom_normals, allow_black, decode_threads):
+    PolyGrp_array, WeightGrp_array, VertOffStart, UVOffStart, FaceBuffOffset = meshInfo
+    with ThreadPoolExecutor(max_workers=decode_threads) as executor:
+        Pending = collections.deque()
+        try:
+            for ge in groups:
+                Pending.append((ge, executor.submit(decodePolygonGroup, f, ge, VertOffStart, UVOffStart, FaceBuffOffset, WeightGrp_array,
+                    use_vertex_colors, use_uv_maps, use_custom_normals, allow_black)))
+                if len(Pending) >= decode_threads:
+                    ready, future = Pending.popleft()
+                    yield ready, future.result()
+            while Pending:
+                ready, future = Pending.popleft()
+                yield ready, future.result()
+        finally:
+            # Nothing more is decoded once the caller stops asking for polygon groups
+            for ready, future in Pending:
+                future.cancel()
+
+# ==== Animation files ====
+@cacheable
+class AnimTrack:
+    __slots__ = ("name", "type", "flags", "frameCount", "dataOffset", "dataSize", "animations")
+
+    def __init__(self):
+        self.name = ""
+        self.type = ""
+        self.flags = 0
+        self.frameCount = 0
+        self.dataOffset = 0
+        self.dataSize = 0
+        self.animations = []
+
+    def __repr__(self):
+        return "Node name: " + str(self.name) + "\t| Type: " + str(self.type) + "\t| Flags: " + str(self.flags) + "\t| # of frames: " + str(self.frameCount) + "\t| Data offset: " + str(self.dataOffset) + "\t| Data size: " + str(self.dataSize) + "\n"
+
+class AnimCompressedHeader:
+    __slots__ = ("unk_4", "flags", "defaultDataOffset", "bitsPerEntry", "compressedDataOffset", "frameCount")
+
+    def __init__(self):
+        self.unk_4 = 0 # always 4?
+        self.flags = 0
+        self.defaultDataOffset = 0
+        self.bitsPerEntry = 0
+        self.compressedDataOffset = 0
+        self.frameCount = 0
+
+    def __repr__(self):
+        return "Flags: " + str(self.flags) + "\t| Bits/entry: " + str(self.bitsPerEntry) + "\t| Data offset: " + str(self.compressedDataOffset) + "\t| Frame count: " + str(self.frameCount) + "\n"
+
+class AnimCompressedItem:
+    __slots__ = ("start", "end", "count")
+
+    def __init__(self, start=0, end=0, count=0):
+        self.start = start
+        self.end = end
+        self.count = count
+
+    def __repr__(self):
+        return "Start: " + str(self.start) + "\t| End: " + str(self.end) + "\t| Count: " + str(self.count) + "\n"
+
+class AnimType(enum.Enum):
+    Transform = 1
+    Visibility = 2
+    Material = 4
+    Camera = 5
+
+class AnimTrackFlags(enum.Enum):
+    Transform = 1
+    Texture = 2
+    Float = 3
+    PatternIndex = 5
+    Boolean = 8
+    Vector4 = 9
+    Direct = 256
+    ConstTransform = 512
+    Compressed = 1024
+    Constant = 1280
+    # Use 65280 or 0xff00 when performing a bitwise 'and' on a flag
+    # Use 255 or 0x00ff when performing a bitwise 'and' on a flag, for uncompressed data
+
+# Utility function to read from a buffer by bits, as Python can only read by bytes
+def readBits(buffer, bitCount, bitPosition):
+    bee = struct.unpack('<B', buffer.read(1))[0] # Peek at next byte
+    buffer.seek(-1, 1) # Go back one byte
+    value = 0
+    LE = 0
+    bitIndex = 0
+    for i in range(bitCount):
+        bit = (bee & (0x1 << bitPosition)) >> bitPosition
+        value = value | (bit << (LE + bitIndex))
+        bitPosition += 1
+        bitIndex += 1
+        if (bitPosition >= 8):
+            bitPosition = 0
+            buffer.seek(1, 1) # Go forward one byte
+            bee = struct.unpack('<B', buffer.read(1))[0] # Peek at next byte
+            buffer.seek(-1, 1) # Go back one byte
+
+        if (bitIndex >= 8):
+            bitIndex = 0
+            if ((LE + 8) > bitCount):
+                LE = bitCount - 1
+            else:
+                LE += 8
+
+    # Also return the bitPosition so that it can be reused by another call to this function
+    return value, bitPosition
+
+# A standard linear interpolation function for individual values
+def lerp(av, bv, v0, v1, factor):
+    if (v0 == v1):
+        return av
+    if (factor == v0):
+        return av
+    if (factor == v1):
+        return bv
+
+    mu = (factor - v0) / (v1 - v0)
+    return (av * (1 - mu)) + (bv * mu)
+
+# Reads an animation file, returning its name, its number of frames, and its tracks grouped by AnimType (numeric)
+# The data of every track is read into its animations, with transforms as [position, rotation, scale] rows of 4 values each
+def readAnimation(animPath):
+    AnimGroups = {}
+    with open(animPath, 'rb') as am:
+        am.seek(0x10, 0)
+        AnimCheck = struct.unpack('<L', am.read(4))[0]
+        if (AnimCheck == 0x414E494D):
+            AnimVerA, AnimVerB, FrameCount, Unk1, Unk2, AnimNameOffset, GroupOffset, GroupCount, BufferOffset, BufferSize = readRecord(am, ANIM_HEADER)
+            print("Total # of frames: " + str(FrameCount))
+            print("GroupOffset: " + str(GroupOffset) + " | " + "GroupCount: " + str(GroupCount) + " | " + "BufferOffset: " + str(BufferOffset) + " | " + "BufferSize: " + str(BufferSize))
+            am.seek(AnimNameOffset, 0)
+            AnimName = readVarLenString(am); am.seek(0x04, 1)
+            print("AnimName: " + AnimName)
+            am.seek(GroupOffset, 0)
+            # Collect information about the nodes
+            for g in range(GroupCount):
+                NodeAnimType, NodeOffset, NodeCount = readRecord(am, ANIM_GROUP)
+                AnimGroups[NodeAnimType] = [] # Create empty array to append to later on
+                NextGroupPos = am.tell()
+                # print("AnimType: " + AnimType(NodeAnimType).name + " | " + "NodeOffset: " + str(NodeOffset) + " | " + "NodeCount: " + str(NodeCount) + " | NextGroupPos: " + str(NextGroupPos))
+                am.seek(NodeOffset, 0)
+                for n in range(NodeCount):
+                    NodeNameOffset, NodeDataOffset, TrackCount = readRecord(am, ANIM_NODE)
+                    at = AnimTrack()
+                    # Special workaround for material tracks
+                    if (NodeAnimType == AnimType.Material.value):
+                        NextNodePos = am.tell()
+                        am.seek(NodeNameOffset, 0)
+                        NodeName = readVarLenString(am)
+                        am.seek(NodeDataOffset, 0)
+                        for tr in range(TrackCount):
+                            at = AnimTrack()
+                            at.name = NodeName
+                            # An offset for the type name, which will be seeked to later
+                            TypeOffset, at.flags, at.frameCount, Unk3_0, at.dataOffset, at.dataSize = readRecord(am, ANIM_TRACK)
+                            NextTrackPos = am.tell()
+                            am.seek(TypeOffset, 0)
+                            at.type = readVarLenString(am)
+                            am.seek(NextTrackPos, 0)
+                            AnimGroups[NodeAnimType].append(at)
+                    else:
+                        NextNodePos = am.tell() + TrackCount - 0x01
+
+                        am.seek(NodeNameOffset, 0)
+                        at.name = readVarLenString(am)
+                        am.seek(NodeDataOffset, 0)
+                        # The type name directly follows the track
+                        TypeOffset, at.flags, at.frameCount, Unk3_0, at.dataOffset, at.dataSize = readRecord(am, ANIM_TRACK)
+                        at.type = readVarLenString(am)
+                        AnimGroups[NodeAnimType].append(at)
+
+                    # print("NodeNameOffset: " + str(NodeNameOffset) + " | " + "NodeDataOffset: " + str(NodeDataOffset) + " | " + "NextNodePos: " + str(NextNodePos))
+                    # print("NodeName: " + str(at.name) + " | " + "TrackFlags: " + str(at.flags) + " | " + "TrackFrameCount: " + str(at.frameCount) + " | " + "Unk3: " + str(Unk3_0) + " | " + "TrackDataOffset: " + str(at.dataOffset) +" | " + "TrackDataSize: " + str(at.dataSize))
+                    am.seek(NextNodePos, 0)
+                # print("---------")
+                am.seek(NextGroupPos, 0)
+            print(AnimGroups)
+            am.seek(BufferOffset, 0) # This must happen or all data will be read incorrectly
+            readAnimations(io.BytesIO(am.read(BufferSize)), AnimGroups)
+        else:
+            raise RuntimeError("%s is not a valid NUANMB file." % animPath)
+    return AnimName, FrameCount, AnimGroups
+
+def readAnimations(ao, AnimGroups):
+    for ag in AnimGroups.items():
+        for track in ag[1]:
+            ao.seek(track.dataOffset, 0)
+            # Collect the actual data pertaining to every node
+            if ((track.flags & 0xff00) == AnimTrackFlags.Constant.value or (track.flags & 0xff00) == AnimTrackFlags.ConstTransform.value):
+                readDirectData(ao, track)
+            if ((track.flags & 0xff00) == AnimTrackFlags.Direct.value):
+                for t in range(track.frameCount):
+                    readDirectData(ao, track)
+            if ((track.flags & 0xff00) == AnimTrackFlags.Compressed.value):
+                readCompressedData(ao, track)
+            #print(track.name + " | " + AnimType(ag[0]).name)
+            #for id, frame in enumerate(track.animations):
+            #    print(id + 1)
+            #    print(frame)
+
+    ao.close()
+
+def readDirectData(aq, track):
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Transform.value):
+        # Scale [X, Y, Z]
+        sx = struct.unpack('<f', aq.read(4))[0]; sy = struct.unpack('<f', aq.read(4))[0]; sz = struct.unpack('<f', aq.read(4))[0]
+        # Rotation [X, Y, Z, W]
+        rx = struct.unpack('<f', aq.read(4))[0]; ry = struct.unpack('<f', aq.read(4))[0]; rz = struct.unpack('<f', aq.read(4))[0]; rw = struct.unpack('<f', aq.read(4))[0]
+        # Position [X, Y, Z]
+        px = struct.unpack('<f', aq.read(4))[0]; py = struct.unpack('<f', aq.read(4))[0]; pz = struct.unpack('<f', aq.read(4))[0]
+        track.animations.append([[px, py, pz, 0], [rx, ry, rz, rw], [sx, sy, sz, 1]])
+        """
+        Matrix composition:
+                | X | Y | Z | W |
+        Position|PX |PY |PZ |PW | 0
+        Rotation|RX |RY |RZ |RW | 1
+        Scale   |SX |SY |SZ |SW | 2
+                  0   1   2   3
+        PW and SW are not used here, instead being populated with '0' and '1', respectively
+        """
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Texture.value):
+        print("Direct texture data extraction not yet implemented")
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Float.value):
+        track.animations.append(struct.unpack('<f', aq.read(4))[0])
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.PatternIndex.value):
+        print("Direct pattern index data extraction not yet implemented")
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Boolean.value):
+        bitValue = struct.unpack('<B', aq.read(1))[0]
+        track.animations.append(bitValue == 1)
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Vector4.value):
+        # [X, Y, Z, W]
+        x = struct.unpack('<f', aq.read(4))[0]; y = struct.unpack('<f', aq.read(4))[0]; z = struct.unpack('<f', aq.read(4))[0]; w = struct.unpack('<f', aq.read(4))[0]
+        track.animations.append([x, y, z, w])
+
+def readCompressedData(aq, track):
+    ach = AnimCompressedHeader()
+    ach.unk_4, ach.flags, ach.defaultDataOffset, ach.bitsPerEntry, ach.compressedDataOffset, ach.frameCount = readRecord(aq, ANIM_COMPRESSED_HEADER)
+    bp = 0 # Workaround to allow the bitreader function to continue at wherever it left off
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Transform.value):
+        acj = [] # Contains an array of AnimCompressedItem objects
+        for i in range(9):
+            acj.append(AnimCompressedItem(*readRecord(aq, ANIM_COMPRESSED_ITEM)))
+        #print(acj)
+
+        aq.seek(track.dataOffset + ach.defaultDataOffset, 0)
+        # Scale [X, Y, Z]
+        sx = struct.unpack('<f', aq.read(4))[0]; sy = struct.unpack('<f', aq.read(4))[0]; sz = struct.unpack('<f', aq.read(4))[0]
+        # Rotation [X, Y, Z, W]
+        rx = struct.unpack('<f', aq.read(4))[0]; ry = struct.unpack('<f', aq.read(4))[0]; rz = struct.unpack('<f', aq.read(4))[0]; rw = struct.unpack('<f', aq.read(4))[0]
+        # Position [X, Y, Z, W]
+        px = struct.unpack('<f', aq.read(4))[0]; py = struct.unpack('<f', aq.read(4))[0]; pz = struct.unpack('<f', aq.read(4))[0]; pw = struct.unpack('<H', aq.read(2))[0]
+
+        aq.seek(track.dataOffset + ach.compressedDataOffset, 0)
+        for f in range(ach.frameCount):
+            transform = [[px, py, pz, pw], [rx, ry, rz, rw], [sx, sy, sz, 1]]
+            """
+            Matrix composition:
+                    | X | Y | Z | W |
+            Position|PX |PY |PZ |PW | 0
+            Rotation|RX |RY |RZ |RW | 1
+            Scale   |SX |SY |SZ |SW | 2
+                      0   1   2   3
+            SW is used to represent absolute scale, being populated with '1' by default
+            """
+
+            for itemIndex in range(len(acj)):
+                # First check if this track should be parsed
+                # TODO: Don't hard code these flags.
+                if (not ((itemIndex == 0 and (ach.flags & 0x3) == 0x3) # isotropic scale
+                    or (itemIndex >= 0 and itemIndex <= 2 and (ach.flags & 0x3) == 0x1) # normal scale
+                    or (itemIndex > 2 and itemIndex <= 5 and (ach.flags & 0x4) > 0)
+                    or (itemIndex > 5 and itemIndex <= 8 and (ach.flags & 0x8) > 0))):
+                    continue
+
+                item = acj[itemIndex]
+                # Decompress
+                valueBitCount = item.count
+                if (valueBitCount == 0):
+                    continue
+
+                value, bp = readBits(aq, valueBitCount, bp)
+                scale = 0
+                for k in range(valueBitCount):
+                    scale = scale | (0x1 << k)
+
+                frameValue = lerp(item.start, item.end, 0, 1, value / float(scale))
+                if frameValue == float('NaN'):
+                    frameValue = 0
+
+                # The 'Transform' type frequently depends on flags
+                if ((ach.flags & 0x3) == 0x3):
+                    # Scale isotropic
+                    if (itemIndex == 0):
+                        transform[2][3] = frameValue
+
+                if ((ach.flags & 0x3) == 0x1):
+                    # Scale normal
+                    if (itemIndex == 0):
+                        transform[2][0] = frameValue
+                    elif (itemIndex == 1):
+                        transform[2][1] = frameValue
+                    elif (itemIndex == 2):
+                        transform[2][2] = frameValue
+
+                # Rotation and Position
+                if (itemIndex == 3):
+                    transform[1][0] = frameValue
+                elif (itemIndex == 4):
+                    transform[1][1] = frameValue
+                elif (itemIndex == 5):
+                    transform[1][2] = frameValue
+                elif (itemIndex == 6):
+                    transform[0][0] = frameValue
+                elif (itemIndex == 7):
+                    transform[0][1] = frameValue
+                elif (itemIndex == 8):
+                    transform[0][2] = frameValue
+
+            # Rotations have an extra bit at the end
+            if ((ach.flags & 0x4) > 0):
+                wBit, bp = readBits(aq, 1, bp)
+                wFlip = wBit == 1
+
+                # W is calculated
+                transform[1][3] = math.sqrt(abs(1 - (pow(transform[1][0], 2) + pow(transform[1][1], 2) + pow(transform[1][2], 2))))
+
+                if wFlip:
+                    transform[1][3] *= -1
+
+            track.animations.append(transform)
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Texture.value):
+        print("Compressed texture data extraction not yet implemented")
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Float.value):
+        print("Compressed float data extraction not yet implemented")
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.PatternIndex.value):
+        print("Compressed pattern index data extraction not yet implemented")
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Boolean.value):
+        aq.seek(track.dataOffset + ach.compressedDataOffset, 0)
+        for t in range(ach.frameCount):
+            bitValue, bp = readBits(aq, ach.bitsPerEntry, bp)
+            track.animations.append(bitValue == 1)
+
+    if ((track.flags & 0x00ff) == AnimTrackFlags.Vector4.value):
+        acj = [] # Contains an array of AnimCompressedItem objects
+        for i in range(4):
+            acj.append(AnimCompressedItem(*readRecord(aq, ANIM_COMPRESSED_ITEM)))
+        #print(acj)
+
+        aq.seek(track.dataOffset + ach.defaultDataOffset, 0)
+        values = []
+        # Copy default values
+        for c in range(4):
+            values.append(struct.unpack('<f', aq.read(4))[0])
+
+        aq.seek(track.dataOffset + ach.compressedDataOffset, 0)
+        for f in range(ach.frameCount):
+            for itemIndex in range(len(acj)):
+                item = acj[itemIndex]
+                # Decompress
+                valueBitCount = item.count
+                if (valueBitCount == 0):
+                    continue
+
+                value, bp = readBits(aq, valueBitCount, bp)
+                scale = 0
+                for k in range(valueBitCount):
+                    scale = scale | (0x1 << k)
+
+                frameValue = lerp(item.start, item.end, 0, 1, value / float(scale))
+                if frameValue == float('NaN'):
+                    frameValue = 0
+
+                values[itemIndex] = frameValue
+
+            track.animations.append(values)
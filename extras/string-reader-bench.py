@@ -0,0 +1,80 @@
+import io, os, sys, time, argparse
+# The shared reading functions live next to the importers, one directory up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from SSBUlt_SSBH import readString, readVarLenString
+
+# Names typical of a fighter's mesh, skeleton and animation files; attribute names repeat for every polygon group
+SAMPLE_NAMES = ["Position0", "Normal0", "Tangent0", "map1", "uvSet", "uvSet1", "uvSet2", "bake1", "colorSet1", "colorSet5",
+                "body_VIS_O_OBJShape", "eyeL_VIS_O_OBJShape", "Trans", "Rot", "Hip", "Waist", "Bust", "ClavicleL", "ShoulderL",
+                "ArmL", "HandL", "FingerL11", "RingL1", "H00_O_Hand_pattern_00", "CustomVector31", "Texture0"]
+
+# The function previously copied into both importers and both extras scripts, kept here for comparison
+def readVarLenStringOld(file):
+    nameBuffer = []
+    while('\x00' not in nameBuffer):
+        nameBuffer.append(str(file.read(1).decode("utf-8", "ignore")))
+    del nameBuffer[-1]
+    return ''.join(nameBuffer)
+
+# Builds a string table in the same layout as SSBH files, with every name padded to a multiple of 4 bytes
+def buildStringTable(count):
+    table = bytearray(); offsets = []
+    for i in range(count):
+        offsets.append(len(table))
+        table += SAMPLE_NAMES[i % len(SAMPLE_NAMES)].encode("utf-8") + b'\x00'
+        table += b'\x00' * (-len(table) % 4)
+    return bytes(table), offsets
+
+def timeFileReader(reader, table, offsets):
+    file = io.BytesIO(table)
+    start = time.perf_counter()
+    names = []
+    for offset in offsets:
+        file.seek(offset, 0)
+        names.append(reader(file))
+    return time.perf_counter() - start, names
+
+def timeBufferReader(table, offsets):
+    start = time.perf_counter()
+    names = [readString(table, offset)[0] for offset in offsets]
+    return time.perf_counter() - start, names
+
+def main():
+    # get the args passed to blender after "--", all of which are ignored by
+    # blender so scripts may receive their own arguments
+    argv = sys.argv
+
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1:]  # get all args after "--"
+    else:
+        argv = argv[1:]  # when run with Python directly instead of Blender
+
+    usage_text = (
+        "Compare the speed of the string readers used for SSBH files:"
+        "  blender --background --python " + __file__ + " -- [options]"
+    )
+
+    parser = argparse.ArgumentParser(description=usage_text)
+
+    parser.add_argument(
+        "-n", "--count", type=int, default=100000,
+        help="The number of strings to read with each reader",
+    )
+
+    args = parser.parse_args(argv)
+
+    table, offsets = buildStringTable(args.count)
+    oldTime, oldNames = timeFileReader(readVarLenStringOld, table, offsets)
+    fileTime, fileNames = timeFileReader(readVarLenString, table, offsets)
+    bufferTime, bufferNames = timeBufferReader(table, offsets)
+    if (oldNames != fileNames or oldNames != bufferNames):
+        raise RuntimeError("The string readers returned different names!")
+
+    print("Read " + str(args.count) + " strings (" + str(len(table)) + " bytes) with each reader:")
+    print("Old byte-by-byte reader: " + str(round(oldTime, 4)) + " seconds")
+    print("Shared file reader: " + str(round(fileTime, 4)) + " seconds (" + str(round(oldTime / fileTime, 1)) + "x faster)")
+    print("Shared buffer reader: " + str(round(bufferTime, 4)) + " seconds (" + str(round(oldTime / bufferTime, 1)) + "x faster)")
+    print("Distinct string objects: " + str(len(set(map(id, oldNames)))) + " before interning, " + str(len(set(map(id, bufferNames)))) + " after")
+
+if __name__ == "__main__":
+    main()